@@ -1,5 +1,5 @@
 from pubsub import pub
-from .config import SOLVER_TOPIC, AGENT_RESPONSED
+from .config import AGENT_RESPONSED, agent_topic
 from abc import ABC, ABCMeta, abstractmethod
 
 
@@ -20,7 +20,7 @@ class Agent(ABC):
     def __init__(self, id) -> None:
         self.id = id
         self.is_alive = True
-        pub.subscribe(self._do, SOLVER_TOPIC)
+        pub.subscribe(self._do, agent_topic(id))
 
     def execute(self, action, **kwargs):  # shouldn't override it
         self._do(self.id, action, kwargs)
@@ -39,13 +39,33 @@ class Agent(ABC):
 
     def terminate(self):
         self.is_alive = False
+        self.detach()
 
-    def _do(
-        self, id, action, kwargs
-    ):  # **kwargs is not allowed here, PyPubsub doesn't support it as callback
-        if id != self.id:
+    def detach(self):
+        """
+        Stop receiving actions sent through pubsub.
+        """
+        manager = pub.getDefaultTopicMgr()
+        topic = manager.getTopic(agent_topic(self.id), okIfNone=True)
+        if topic is None:  # already detached
             return
+        topic.unsubscribe(self._do)
+        # every agent id has its own topic, so it is deleted with its last listener to keep the
+        # topic tree from growing with agent churn
+        if not topic.hasListeners():
+            manager.delTopic(topic.getName())
+
+    def perform(self, action, **kwargs):
+        """
+        Execute an action and return its result without publishing it. Environments that dispatch
+        actions to agents directly use it instead of the pubsub round-trip.
+        """
         if not self.is_alive:
             raise RuntimeError(f"The current agent{self.id} is unavailable.")
-        ret = self._execute(action, **kwargs)
+        return self._execute(action, **kwargs)
+
+    def _do(
+        self, id, action, kwargs
+    ):  # **kwargs is not allowed here, PyPubsub doesn't support it as callback
+        ret = self.perform(action, **kwargs)
         pub.sendMessage(AGENT_RESPONSED, id=self.id, ret=ret)
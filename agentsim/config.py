@@ -1,4 +1,5 @@
-# agents will subscribe it to execute actions
+# actions are sent to the subtopic of a specific agent, see `agent_topic`. Listeners of
+# this topic observe the actions sent to every agent.
 SOLVER_TOPIC = "sovler.action"
 
 # enviroment will subscribe it to update itself
@@ -8,9 +9,17 @@ AGENT_RESPONSED = "agent.action.completed"
 ENV_UPDATED = "env.updated"
 
 
+def agent_topic(id):
+    """
+    Return the topic that the agent whose id is `id` subscribes to for executing actions.
+    """
+    return f"{SOLVER_TOPIC}.agent{id}"
+
+
 class register:
     player_registry = {}
     maze_solver_registry = {}
+    maze_partitioner_registry = {}
 
     @staticmethod
     def player(type_name):
@@ -28,3 +37,11 @@ class register:
             return cls
 
         return decorator
+
+    @staticmethod
+    def maze_partitioner(type_name):
+        def decorator(cls):
+            register.maze_partitioner_registry[type_name] = cls
+            return cls
+
+        return decorator
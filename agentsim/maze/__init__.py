@@ -1,14 +1,32 @@
 from .env import MazeCleanEnv
 from .cleaner import Cleaner, Action
-from .maze import Kruskal, GrowingTree, RecursiveDivision
-from .window import MazeWindow
+from .maze import MazeGenerator, Kruskal, GrowingTree, RecursiveDivision
+from .partition import SpectralPartitioner, TreePartitioner
+from .render import FrameRenderer
+from .solve import Plan
+
+
+def __getattr__(name):
+    # pyglet needs a display as soon as it is imported, so the window is only imported when
+    # it is used and headless code can import this package
+    if name == "MazeWindow":
+        from .window import MazeWindow
+
+        return MazeWindow
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "Action",
     "MazeCleanEnv",
     "Cleaner",
+    "MazeGenerator",
     "Kruskal",
     "GrowingTree",
     "RecursiveDivision",
+    "SpectralPartitioner",
+    "TreePartitioner",
+    "FrameRenderer",
+    "Plan",
     "MazeWindow",
 ]
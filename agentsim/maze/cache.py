@@ -0,0 +1,46 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+
+
+def grid_digest(grid):
+    """
+    Return a key identifying the content of a maze grid.
+    """
+    # hash the buffer of the grid rather than a copy of it
+    digest = hashlib.blake2b(
+        memoryview(np.ascontiguousarray(grid)), digest_size=16
+    ).hexdigest()
+    return grid.shape, grid.dtype.str, digest
+
+
+class LRUCache:
+    def __init__(self, maxsize=16) -> None:
+        """
+        A mapping that keeps at most `maxsize` of the most recently used items.
+        """
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._items:
+            return default
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
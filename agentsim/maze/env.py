@@ -1,11 +1,14 @@
-from sklearn.cluster import SpectralClustering
 from .maze import GrowingTree
+from .graph import grid_edges, MazeGraph
+from .cache import LRUCache, grid_digest
 import networkx as nx
 import numpy as np
-from .solve import search
+from .solve import Plan, search
+from . import partition
 from ..agent import AgentCrashed
 from pubsub import pub
-from ..config import SOLVER_TOPIC, AGENT_RESPONSED, ENV_UPDATED, register
+from ..config import agent_topic, register
+from ..shm import SharedArray
 from ..simenv import SimEnv
 
 
@@ -18,6 +21,11 @@ class MazeCleanEnv(SimEnv):
         n_subgraphs=None,
         maze_generator=None,
         method="search",
+        partitioner="spectral",
+        graph_backend="networkx",
+        cache_size=16,
+        headless=False,
+        shared_memory=False,
         **kwargs,
     ) -> None:
         """
@@ -35,13 +43,36 @@ class MazeCleanEnv(SimEnv):
             `maze_generator` (callable, optional):
                 A callable object to generate the maze. Defaults to GrowingTree.
             `method` (str, optional):
-                The method used to clean the maze. Supported methods are "IPPO" and "search". Defaults to "search".
+                The name of a registered solver used to clean the maze. The built-in solvers are "search", which
+                walks every subgraph with a single agent, and "tour_split", which shares the walk of a subgraph
+                among all its agents, so `n_agents` may exceed `n_subgraphs`. Defaults to "search".
+            `partitioner` (str or callable, optional):
+                The strategy used to partition the maze into subgraphs, either the name of a registered partitioner
+                ("spectral" or "tree") or a callable object taking a graph and the number of parts and returning
+                the part label of each node. Defaults to "spectral".
+            `graph_backend` (str, optional):
+                The representation of the maze graph. Supported backends are "networkx" and "csr". "csr" stores
+                the graph as a compact `MazeGraph`, which is much smaller for large mazes. Defaults to "networkx".
+            `cache_size` (int, optional):
+                The number of mazes whose partitions and solver plans are kept across `reset` calls, keyed on
+                the content of the maze grid. 0 disables the cache. Defaults to 16.
+            `headless` (bool, optional):
+                Whether to dispatch actions straight to the target agents and apply their results inline
+                instead of going through pubsub. It is much faster for batch simulations, but pubsub listeners
+                of `SOLVER_TOPIC` won't observe the actions. Defaults to False.
+            `shared_memory` (bool, optional):
+                Whether to back `maze` and `positions` with shared memory, so other processes can read the live
+                state without copying by attaching to `shared_specs` with `SharedArray.attach`. Call `close` to
+                release it. Defaults to False.
             **kwParameters: Additional parameters for initializing the method.
 
         Raises:
-            ValueError: If the symbol map provided by the maze generator is invalid.
+            ValueError: If the symbol map provided by the maze generator is invalid or the graph backend is unknown.
         """
         super().__init__()
+        if graph_backend not in ["networkx", "csr"]:
+            raise ValueError(f"Unknown graph backend {graph_backend}")
+        self.graph_backend = graph_backend
 
         self.w, self.h = w, h
         self.maze_gen = maze_generator if maze_generator else GrowingTree()
@@ -65,10 +96,25 @@ class MazeCleanEnv(SimEnv):
             v: k for k, v in self.symbol_map.items()
         }  # reset_maze need this attr
         self.cached_maze = None
+        self.shared_memory = shared_memory
+        self._shared_arrays = {}
+        self.maze = None
+        self.positions = None  # (row, col) of every agent, -1 if it isn't in the maze
 
+        self.headless = headless
+        # changed cells are only tracked once a window asks for them, and never when headless
+        self._track_dirty = False
         self.n_agents = n_agents
         self.n_subgraphs = n_subgraphs if n_subgraphs else n_agents
         self._core = register.maze_solver_registry[method](**kwargs)
+        self._partitioner = (
+            register.maze_partitioner_registry[partitioner]()
+            if isinstance(partitioner, str)
+            else partitioner
+        )
+        self._cache = LRUCache(cache_size)
+        self._graph = self._graph_key = None
+        self.agents = []
         self.reset(True)
         self.symbol_map = {
             **self.maze_gen.symbol_map,
@@ -79,22 +125,29 @@ class MazeCleanEnv(SimEnv):
     def update(self, id, ret):
         new_pos, old_pos = ret
         symbol_map = self.symbol_map
+        agent = f"agent{id}"
         if new_pos is not None:
-            if self.maze[*new_pos] == symbol_map["wall"]:
+            current = self.maze[*new_pos]
+            if current == symbol_map["wall"]:
                 raise AgentCrashed(id, f"it hits the wall at {new_pos}.")
-            if self.maze[*new_pos] not in [
+            if current not in [
                 symbol_map["visited"],
                 symbol_map["cell"],
-                symbol_map[f"agent{id}"],
+                symbol_map[agent],
             ]:
-                raise AgentCrashed(
-                    [id, self.maze[*new_pos]], f"they collide at {new_pos}"
-                )
-            self.maze[*new_pos] = symbol_map[f"agent{id}"]
-            self._graph.nodes[new_pos]["value"] = f"agent{id}"
+                raise AgentCrashed([id, current], f"they collide at {new_pos}")
+            if current == symbol_map["cell"]:
+                self._n_cleaned += 1
+            self.maze[*new_pos] = symbol_map[agent]
+            self._graph.nodes[new_pos]["value"] = agent
+            if self._track_dirty:
+                self._dirty_cells.add(new_pos)
         if old_pos is not None:
             self.maze[*old_pos] = symbol_map["visited"]
             self._graph.nodes[old_pos]["value"] = "visited"
+            if self._track_dirty:
+                self._dirty_cells.add(old_pos)
+        self.positions[self._agent_rows[id]] = new_pos if new_pos is not None else -1
 
     def reset(self, regenerate=False):
         """
@@ -104,12 +157,74 @@ class MazeCleanEnv(SimEnv):
             regenerate (bool, optional): Whether to regenerate the maze. Defaults to False.
 
         Resets the maze to its initial state. If regenerate is True or if the cached maze is None,
-        a new maze is generated. The maze graph is also updated.
+        a new maze is generated. The maze graph is also updated. Partitions and solver plans of
+        a maze seen recently are reused instead of being recomputed.
         """
+        self._n_cleaned = self._last_n_cleaned = 0
+        self._dirty_cells = set()
+        self._full_redraw = True
         if regenerate or self.cached_maze is None:
             self.cached_maze = self.maze_gen(self.w, self.h)
-        self.maze = self.cached_maze.copy()
-        self.maze_graph = self._to_graph()
+        if self._graph is not None and grid_digest(self.cached_maze) == self._graph_key:
+            # same maze as the last episode, only restore the cells the agents went through
+            if isinstance(self._graph, MazeGraph):
+                np.copyto(self._graph.state, self._graph_state)
+            else:
+                for pos in map(
+                    tuple, np.argwhere(self.maze != self.cached_maze).tolist()
+                ):
+                    if pos in self._graph:
+                        self._graph.nodes[pos]["value"] = self.digit_symbol_map[
+                            self.cached_maze[pos]
+                        ]
+            self._restore_state()
+            self.maze_graph = self._graph
+        else:
+            self._restore_state()
+            self.maze_graph = self._to_graph()
+
+    def _restore_state(self):
+        # the arrays are allocated once and restored in place, so readers of shared memory
+        # keep seeing the live state
+        maze = self.cached_maze
+        # agents are marked by their index from 1, which may not fit in the dtype of the grid
+        dtype = np.promote_types(maze.dtype, np.min_scalar_type(-self.n_agents - 1))
+        if (
+            self.maze is None
+            or self.maze.shape != maze.shape
+            or self.maze.dtype != dtype
+        ):
+            self.maze = self._allocate("maze", maze.shape, dtype)
+        np.copyto(self.maze, maze)
+        if self.positions is None:
+            self.positions = self._allocate("positions", (self.n_agents, 2), np.int32)
+        self.positions.fill(-1)
+
+    def _allocate(self, name, shape, dtype):
+        if not self.shared_memory:
+            return np.empty(shape, dtype=dtype)
+        if name in self._shared_arrays:
+            self._shared_arrays.pop(name).unlink()
+        array = self._shared_arrays[name] = SharedArray(shape, dtype)
+        return array.array
+
+    @property
+    def shared_specs(self):
+        """
+        A map from "maze" and "positions" to the specs of their shared memory, which other processes
+        pass to `SharedArray.attach`. It is empty if the environment doesn't use shared memory.
+        """
+        return {name: array.spec for name, array in self._shared_arrays.items()}
+
+    def close(self):
+        """
+        Release the shared memory of `maze` and `positions`. They are copied to private arrays first.
+        """
+        if self._shared_arrays:
+            self.maze, self.positions = self.maze.copy(), self.positions.copy()
+            for array in self._shared_arrays.values():
+                array.unlink()
+            self._shared_arrays = {}
 
     @property
     def maze_graph(self):
@@ -118,23 +233,71 @@ class MazeCleanEnv(SimEnv):
     @maze_graph.setter
     def maze_graph(self, graph):
         self._graph = graph
-        self._subgraphs = (
-            self._spectral_partition(graph, self.n_agents)
-            if self.n_subgraphs > 1
-            else graph
-        )
+        for agent in self.agents:
+            agent.detach()
         self.agents = self._core.get_agents(self.n_agents)
-
+        self._agent_map = {agent.id: agent for agent in self.agents}
+        self._agent_rows = {agent.id: i for i, agent in enumerate(self.agents)}
         indeces = [
             i * (self.n_agents // self.n_subgraphs) for i in range(self.n_subgraphs)
         ] + [self.n_agents]
-        self._solvers = [
-            self._core.solver(g, self.agents[indeces[i] : indeces[i + 1]])
-            for i, g in enumerate(self._subgraphs)
-        ]
+
+        key = self._graph_key = grid_digest(self.cached_maze)
+        labels, plans = self._cache.get(key, (None, None))
+        if plans is None:
+            if labels is None and self.n_subgraphs > 1:
+                labels = self._partitioner(graph, self.n_subgraphs)
+            self._subgraphs = (
+                self._partition(graph, labels) if self.n_subgraphs > 1 else [graph]
+            )
+            groups = [
+                self.agents[indeces[i] : indeces[i + 1]]
+                for i in range(len(self._subgraphs))
+            ]
+            cacheable = getattr(self._core, "cacheable", False)
+            if hasattr(self._core, "compile"):
+                # solvers compiling whole episodes into arrays are stepped by index
+                plans = [
+                    self._core.compile(g, agents)
+                    for g, agents in zip(self._subgraphs, groups)
+                ]
+            else:
+                solvers = [
+                    self._core.solver(g, agents)
+                    for g, agents in zip(self._subgraphs, groups)
+                ]
+                if cacheable:
+                    plans = [list(solver) for solver in solvers]
+            self._cache.put(key, (labels, plans if cacheable else None))
+            if plans is None:
+                self._solvers, self._plans = solvers, None
+                return
+        if all(isinstance(plan, Plan) for plan in plans):
+            self._solvers, self._plans = None, plans
+            self._plan_step = 0
+        else:
+            self._solvers, self._plans = [iter(plan) for plan in plans], None
+
+    @property
+    def plans(self):
+        """
+        The `Plan` of every subgraph of the current maze, or None if the solver doesn't compile plans.
+        """
+        return self._plans
 
     def step(self):
+        self._last_n_cleaned = self._n_cleaned
         is_working = False
+        if self._plans is not None:
+            t = self._plan_step
+            self._plan_step += 1
+            for plan in self._plans:
+                if t < len(plan):
+                    is_working = True
+                    for id, action, kwargs in plan.step(t):
+                        self._dispatch(id, action, kwargs)
+            return is_working
+
         for solver in self._solvers:
             try:
                 msgs = next(solver)
@@ -143,66 +306,88 @@ class MazeCleanEnv(SimEnv):
             else:
                 is_working = True
                 for msg in msgs:
-                    id, action = msg.pop("id"), msg.pop("action")
-                    pub.sendMessage(SOLVER_TOPIC, id=id, action=action, kwargs=msg)
+                    id, action = msg["id"], msg["action"]
+                    kwargs = {k: v for k, v in msg.items() if k not in ["id", "action"]}
+                    self._dispatch(id, action, kwargs)
         return is_working
 
-    def _spectral_partition(self, graph, num):
-        adjacency_matrix = nx.to_numpy_array(graph)
-        sc = SpectralClustering(
-            n_clusters=num,
-            affinity="precomputed",
-            n_init=100,
-            assign_labels="discretize",
-        )
-        sc.fit(adjacency_matrix)
+    def _dispatch(self, id, action, kwargs):
+        if self.headless:
+            self.update(id, self._agent_map[id].perform(action, **kwargs))
+        else:
+            pub.sendMessage(agent_topic(id), id=id, action=action, kwargs=kwargs)
 
-        return [
-            graph.subgraph(
-                [node for node, label in zip(graph.nodes(), sc.labels_) if label == i]
-            )
-            for i in range(num)
-        ]
+    def pop_dirty_cells(self):
+        """
+        Return the set of `(row, col)` cells of `maze` that changed since the last call, and forget them.
+        Returns None if the whole maze should be redrawn, e.g. after a reset. Cells are tracked from the
+        first call on, which returns None. Headless environments don't track cells and always return None.
+        """
+        if self.headless:
+            return None
+        if not self._track_dirty:
+            self._track_dirty = True
+            self._dirty_cells = set()
+            self._full_redraw = False
+            return None
+        cells, self._dirty_cells = self._dirty_cells, set()
+        if self._full_redraw:
+            self._full_redraw = False
+            return None
+        return cells
+
+    def observe(self):
+        """
+        Return the maze grid, with agents marked by their symbol. The array is updated in place.
+        """
+        return self.maze
+
+    def reward(self):
+        """
+        Return the number of cells that agents reached for the first time during the last step.
+        """
+        return self._n_cleaned - self._last_n_cleaned
+
+    def run(self, max_steps=None):
+        """
+        Step the environment until every solver finishes or `max_steps` steps are taken.
+
+        Returns:
+            The number of steps taken.
+        """
+        n_steps = 0
+        while (max_steps is None or n_steps < max_steps) and self.step():
+            n_steps += 1
+        return n_steps
+
+    def _partition(self, graph, labels):
+        nodes = list(graph.nodes())
+        labels = np.asarray(labels)
+        # the nodes of every part, in one pass over the labels
+        order = np.argsort(labels, kind="stable")
+        bounds = np.cumsum(np.bincount(labels, minlength=self.n_subgraphs))
+        parts = np.split(order, bounds[: self.n_subgraphs - 1])
+        return [graph.subgraph([nodes[i] for i in part.tolist()]) for part in parts]
 
     def _to_graph(self):
-        g = nx.Graph()
         if self.maze is None:
-            return g
+            return nx.Graph()
 
-        visited = np.zeros_like(self.maze, dtype=bool)
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-        n_row, n_col = self.maze.shape
         symbol_map = self.symbol_map
+        passable = [symbol_map["cell"], symbol_map["visited"]]
+        if self.graph_backend == "csr":
+            g = MazeGraph.from_grid(self.maze, passable, self.digit_symbol_map)
+            self._graph_state = g.state.copy()
+            return g
 
-        def dfs(x, y):
-            visited[x, y] = True
-            for dx, dy in directions:
-                nx, ny = x + dx, y + dy
-                if (
-                    0 <= nx < n_row
-                    and 0 <= ny < n_col
-                    and self.maze[nx, ny]
-                    in [
-                        symbol_map["cell"],
-                        symbol_map["visited"],
-                    ]
-                    and not visited[nx, ny]
-                ):
-                    g.add_node((nx, ny), value=self.digit_symbol_map[self.maze[nx, ny]])
-                    g.add_edge((x, y), (nx, ny))
-                    dfs(nx, ny)
-
-        for r in range(n_row):
-            for c in range(n_col):
-                if (
-                    self.maze[r, c]
-                    in [
-                        symbol_map["cell"],
-                        symbol_map["visited"],
-                    ]
-                    and not visited[r, c]
-                ):
-                    g.add_node((r, c), value=self.digit_symbol_map[self.maze[r, c]])
-                    dfs(r, c)
+        g = nx.Graph()
+        positions, edges = grid_edges(self.maze, passable)
+        values = self.maze[positions[:, 0], positions[:, 1]]
+        nodes = list(map(tuple, positions.tolist()))
+        g.add_nodes_from(
+            (node, {"value": self.digit_symbol_map[value]})
+            for node, value in zip(nodes, values.tolist())
+        )
+        g.add_edges_from((nodes[u], nodes[v]) for u, v in edges.tolist())
 
         return g
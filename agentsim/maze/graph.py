@@ -0,0 +1,253 @@
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_array
+from scipy.sparse.csgraph import breadth_first_order
+
+
+def grid_edges(grid, passable):
+    """
+    Find passable cells of a grid and the 4-neighbour adjacency between them.
+
+    Parameters:
+        `grid` (np.ndarray):
+            A 2D array of cell symbols.
+        `passable` (list):
+            Symbols of the cells that agents can walk through.
+
+    Returns:
+        A tuple `(positions, edges)`. `positions` is an `(N, 2)` array of the coordinates of
+        passable cells in row-major order. `edges` is an `(E, 2)` array of indices into
+        `positions`, one row per pair of horizontally or vertically adjacent passable cells.
+    """
+    mask = np.isin(grid, passable)
+    index = np.full(grid.shape, -1, dtype=np.int32)
+    positions = np.argwhere(mask)
+    index[mask] = np.arange(len(positions), dtype=np.int32)
+
+    # shifted masks: a cell and its right (down) neighbour are both passable
+    right = mask[:, :-1] & mask[:, 1:]
+    down = mask[:-1, :] & mask[1:, :]
+    edges = np.concatenate(
+        [
+            np.stack([index[:, :-1][right], index[:, 1:][right]], axis=1),
+            np.stack([index[:-1, :][down], index[1:, :][down]], axis=1),
+        ]
+    )
+    return positions, edges
+
+
+def adjacency_matrix(graph):
+    """
+    Return the adjacency matrix of a networkx graph or a `MazeGraph` as a
+    `scipy.sparse.csr_array` ordered like `graph.nodes()`.
+    """
+    if isinstance(graph, MazeGraph):
+        return graph.adjacency()
+    matrix = nx.to_scipy_sparse_array(graph, format="csr")
+    # scikit-learn only accepts sparse matrices with 32-bit indices
+    return csr_array(
+        (matrix.data, matrix.indices.astype(np.int32), matrix.indptr.astype(np.int32)),
+        shape=matrix.shape,
+    )
+
+
+class MazeGraph:
+    """
+    A compact, array-backed graph of the passable cells of a maze.
+
+    Cells are stored as integer indices. Their neighbours are kept in CSR form (`indptr`,
+    `indices`) and their `value` attribute is kept as a small integer code in `state`, so
+    a graph takes a few bytes per cell instead of a networkx node and edge dicts.
+
+    It mimics the part of the `networkx.Graph` interface that the maze pipeline uses, i.e.
+    `nodes`, `neighbors`, `degree`, `number_of_nodes` and `subgraph`. Nodes are addressed
+    by their `(row, col)` position as in the networkx graph. Unlike networkx, a subgraph
+    is an independent copy rather than a view of its parent.
+    """
+
+    def __init__(self, shape, positions, indptr, indices, state, labels) -> None:
+        self.shape = shape
+        self.positions = positions
+        self.indptr = indptr
+        self.indices = indices
+        self.state = state
+        self._labels = labels
+        self._codes = {label: code for code, label in enumerate(labels)}
+        # flat grid index of every node, sorted since nodes are kept in row-major order, so a
+        # node is found by binary search with memory proportional to the graph, not the grid
+        self._keys = positions[:, 0].astype(np.int64) * shape[1] + positions[:, 1]
+        if np.any(self._keys[1:] <= self._keys[:-1]):
+            raise ValueError(
+                "The positions of a MazeGraph must be unique and row-major"
+            )
+
+    @classmethod
+    def from_grid(cls, grid, passable, symbols):
+        """
+        Build the graph of a maze grid.
+
+        Parameters:
+            `grid` (np.ndarray):
+                A 2D array of cell symbols.
+            `passable` (list):
+                Symbols of the cells that agents can walk through.
+            `symbols` (dict):
+                A map from cell symbols to the names stored as node `value`.
+        """
+        positions, edges = grid_edges(grid, passable)
+        n_nodes = len(positions)
+        src = np.concatenate([edges[:, 0], edges[:, 1]])
+        dst = np.concatenate([edges[:, 1], edges[:, 0]])
+        order = np.lexsort((dst, src))
+        indptr = np.zeros(n_nodes + 1, dtype=np.int32)
+        np.cumsum(np.bincount(src, minlength=n_nodes), out=indptr[1:])
+
+        digits, state = np.unique(
+            grid[positions[:, 0], positions[:, 1]], return_inverse=True
+        )
+        return cls(
+            grid.shape,
+            positions.astype(np.int32),
+            indptr,
+            dst[order].astype(np.int32),
+            state.astype(np.int16),
+            [symbols[digit] for digit in digits.tolist()],
+        )
+
+    @property
+    def nodes(self):
+        return _NodeView(self)
+
+    def index(self, node):
+        idx = self._find(node)
+        if idx < 0:
+            raise KeyError(node)
+        return idx
+
+    def node(self, idx):
+        row, col = self.positions[idx].tolist()
+        return row, col
+
+    def number_of_nodes(self):
+        return len(self.positions)
+
+    def neighbors(self, node):
+        idx = self.index(node)
+        for nbr in self.indices[self.indptr[idx] : self.indptr[idx + 1]].tolist():
+            yield self.node(nbr)
+
+    def degree(self):
+        return zip(map(tuple, self.positions.tolist()), np.diff(self.indptr).tolist())
+
+    def adjacency(self):
+        """
+        Return the adjacency matrix as a `scipy.sparse.csr_array` ordered like `nodes`.
+        """
+        n_nodes = self.number_of_nodes()
+        return csr_array(
+            (np.ones(len(self.indices)), self.indices, self.indptr),
+            shape=(n_nodes, n_nodes),
+        )
+
+    def subgraph(self, nodes):
+        keep = np.zeros(self.number_of_nodes(), dtype=bool)
+        keep[[self.index(node) for node in nodes]] = True
+        remap = np.cumsum(keep, dtype=np.int32) - 1
+
+        degree = np.diff(self.indptr)
+        src = np.repeat(np.arange(self.number_of_nodes()), degree)
+        mask = keep[src] & keep[self.indices]
+        indptr = np.zeros(int(keep.sum()) + 1, dtype=np.int32)
+        np.cumsum(
+            np.bincount(remap[src[mask]], minlength=len(indptr) - 1), out=indptr[1:]
+        )
+        return MazeGraph(
+            self.shape,
+            self.positions[keep],
+            indptr,
+            remap[self.indices[mask]],
+            self.state[keep],
+            list(self._labels),
+        )
+
+    def farthest(self, source):
+        """
+        Return the node with the longest shortest path from `source`.
+        """
+        order = breadth_first_order(
+            self.adjacency(), self.index(source), return_predecessors=False
+        )
+        return self.node(order[-1])
+
+    def _find(self, node):
+        row, col = node
+        if not (0 <= row < self.shape[0] and 0 <= col < self.shape[1]):
+            return -1
+        key = row * self.shape[1] + col
+        keys = self._keys
+        idx = int(keys.searchsorted(key))
+        return idx if idx < len(keys) and keys[idx] == key else -1
+
+    def _get_value(self, idx):
+        return self._labels[self.state[idx]]
+
+    def _set_value(self, idx, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._labels)
+            self._labels.append(value)
+        self.state[idx] = code
+
+    def __contains__(self, node):
+        return self._find(node) >= 0
+
+    def __iter__(self):
+        return iter(map(tuple, self.positions.tolist()))
+
+    def __len__(self):
+        return self.number_of_nodes()
+
+
+class _NodeView:
+    def __init__(self, graph) -> None:
+        self._graph = graph
+
+    def __call__(self, data=False):
+        if not data:
+            return iter(self._graph)
+        values = (self._graph._get_value(idx) for idx in range(len(self._graph)))
+        if data is True:
+            return zip(self._graph, ({"value": value} for value in values))
+        if data != "value":
+            raise KeyError(data)
+        return zip(self._graph, values)
+
+    def __getitem__(self, node):
+        return _NodeAttrs(self._graph, self._graph.index(node))
+
+    def __iter__(self):
+        return iter(self._graph)
+
+    def __len__(self):
+        return len(self._graph)
+
+    def __contains__(self, node):
+        return node in self._graph
+
+
+class _NodeAttrs:
+    __slots__ = ("_graph", "_idx")
+
+    def __init__(self, graph, idx) -> None:
+        self._graph = graph
+        self._idx = idx
+
+    def __getitem__(self, key):
+        if key != "value":
+            raise KeyError(key)
+        return self._graph._get_value(self._idx)
+
+    def __setitem__(self, key, value):
+        if key != "value":
+            raise KeyError(key)
+        self._graph._set_value(self._idx, value)
@@ -1,125 +1,287 @@
 import numpy as np
-from random import randrange, shuffle, choice
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import coo_array
+from scipy.sparse.csgraph import minimum_spanning_tree
 
 
-class GrowingTree:
-    def __init__(self, symbol_map=None, backtrack_ratio=1.0):
-        self.backtrack_ratio = backtrack_ratio
+def _carve(grid, passages, w, symbol_map):
+    """
+    Open the walls between pairs of adjacent cells given as flat indices into the h x w
+    lattice of cells, whose cell (r, c) lies at (2r + 1, 2c + 1) in the grid.
+    """
+    rows, cols = np.divmod(passages, w)
+    grid[rows.sum(axis=1) + 1, cols.sum(axis=1) + 1] = symbol_map["cell"]
+
+
+def _uniform(rng):
+    """
+    Return a function drawing uniform floats in [0, 1) from `rng` in blocks, which is
+    much cheaper than one call to `rng.random()` per draw.
+    """
+    randoms = []
+
+    def uniform():
+        if not randoms:
+            randoms.extend(rng.random(1 << 14).tolist())
+        return randoms.pop()
+
+    return uniform
+
+
+def _generate_chunk(generator, h, w, entropy, start, stop, path=None):
+    """
+    Generate the mazes `start` to `stop` of a batch. The i-th maze is generated from the
+    i-th child of the batch seed, so it doesn't depend on how the batch is split.
+    """
+    H, W = 2 * h + 1, 2 * w + 1
+    out = (
+        np.lib.format.open_memmap(path, mode="r+")[start:stop]
+        if path is not None
+        else np.empty((stop - start, H, W), dtype=np.int8)
+    )
+    for i in range(start, stop):
+        seed = np.random.SeedSequence(entropy, spawn_key=(i,))
+        out[i - start] = generator._generate(h, w, np.random.default_rng(seed))
+    if path is not None:
+        out.flush()
+        return None
+    return out
+
+
+class MazeGenerator:
+    def __init__(self, symbol_map=None, seed=None):
+        """
+        Base class of maze generators. Derived classes implement `_generate`.
+
+        Parameters:
+            `symbol_map` (dict, optional):
+                A map from "wall" and "cell" to the symbols used in the grid.
+            `seed` (int or np.random.Generator, optional):
+                Seed of the random generator. The same seed generates the same sequence of mazes.
+        """
         self.symbol_map = symbol_map
+        self.rng = np.random.default_rng(seed)
 
     def __call__(self, h, w):
+        assert self.symbol_map is not None
+        return self._generate(h, w, self.rng)
+
+    def _generate(self, h, w, rng):
+        """
+        Generate a `(2h + 1, 2w + 1)` maze grid drawing all randomness from `rng`.
+        """
+        raise NotImplementedError("This method should be implemented by derived class")
+
+    def generate_batch(self, n, h, w, seed=None, n_jobs=None, out=None):
+        """
+        Generate a batch of mazes.
+
+        Parameters:
+            `n` (int):
+                The number of mazes.
+            `h`, `w` (int):
+                The size of each maze in cells.
+            `seed` (int, optional):
+                Seed of the batch. The same seed generates the same batch whatever `n_jobs` is.
+            `n_jobs` (int, optional):
+                The number of worker processes. Defaults to generating in the current process.
+            `out` (str, optional):
+                Path of a `.npy` file to stream the mazes into. The file is memory-mapped, so
+                the batch doesn't need to fit in memory.
+
+        Returns:
+            An `(n, 2h + 1, 2w + 1)` int8 array, memory-mapped to `out` if it is given.
+        """
         assert self.symbol_map is not None
         H, W = 2 * h + 1, 2 * w + 1
-        grid = np.full((H, W), self.symbol_map["wall"], dtype=int)
-        start_pos = (randrange(1, H, 2), randrange(1, W, 2))
-        grid[start_pos] = self.symbol_map["cell"]
-        active = [start_pos]
+        entropy = np.random.SeedSequence(seed).entropy
+        if out is not None:
+            batch = np.lib.format.open_memmap(
+                out, mode="w+", dtype=np.int8, shape=(n, H, W)
+            )
+        else:
+            batch = np.empty((n, H, W), dtype=np.int8)
+
+        if not n_jobs or n_jobs == 1:
+            for i in range(n):
+                seed = np.random.SeedSequence(entropy, spawn_key=(i,))
+                batch[i] = self._generate(h, w, np.random.default_rng(seed))
+        else:
+            chunk = max(1, min(n // (4 * n_jobs), (64 << 20) // (H * W)))
+            with ProcessPoolExecutor(n_jobs) as pool:
+                futures = {
+                    start: pool.submit(
+                        _generate_chunk,
+                        self,
+                        h,
+                        w,
+                        entropy,
+                        start,
+                        min(start + chunk, n),
+                        out,
+                    )
+                    for start in range(0, n, chunk)
+                }
+                for start, future in futures.items():
+                    mazes = future.result()
+                    if mazes is not None:
+                        batch[start : start + len(mazes)] = mazes
+
+        if out is not None:
+            batch.flush()
+        return batch
+
+
+class GrowingTree(MazeGenerator):
+    def __init__(self, symbol_map=None, backtrack_ratio=1.0, seed=None):
+        """
+        Generate perfect mazes with the growing tree algorithm.
+
+        Parameters:
+            `symbol_map` (dict, optional):
+                A map from "wall" and "cell" to the symbols used in the grid.
+            `backtrack_ratio` (float, optional):
+                The probability to grow from the newest active cell rather than a random one.
+                1.0 gives a recursive backtracker, 0.0 gives Prim-like mazes. Defaults to 1.0.
+            `seed` (int or np.random.Generator, optional):
+                Seed of the random generator. The same seed generates the same sequence of mazes.
+        """
+        super().__init__(symbol_map, seed)
+        self.backtrack_ratio = backtrack_ratio
 
-        def find_neighbors(r, c, symbol):
+    def _generate(self, h, w, rng):
+        H, W = 2 * h + 1, 2 * w + 1
+        grid = np.full((H, W), self.symbol_map["wall"], dtype=np.int8)
+        grid[1:-1:2, 1:-1:2] = self.symbol_map["cell"]
+        uniform = _uniform(rng)
+
+        # cells are flat indices into the h x w lattice of cells. `active` is a stack of
+        # the cells that may still grow. Exhausted cells are flagged in `dead` and dropped
+        # lazily, so removing one from the middle of the stack is O(1).
+        n = h * w
+        carved = bytearray(n)
+        dead = bytearray(n)
+        active = [int(uniform() * n)]
+        carved[active[0]] = 1
+        n_alive = 1
+        passages = []
+        ratio = self.backtrack_ratio
+
+        while n_alive:
+            if ratio >= 1 or (ratio > 0 and uniform() < ratio):
+                while dead[active[-1]]:
+                    active.pop()
+                current = active[-1]
+            else:
+                if 2 * n_alive < len(active):
+                    active = [cell for cell in active if not dead[cell]]
+                current = active[int(uniform() * len(active))]
+                while dead[current]:
+                    current = active[int(uniform() * len(active))]
+
+            col = current % w
             neighbors = []
-            directions = [(r - 2, c), (r + 2, c), (r, c - 2), (r, c + 2)]
-            for dr, dc in directions:
-                if 0 < dr < H - 1 and 0 < dc < W - 1 and grid[dr, dc] == symbol:
-                    neighbors.append((dr, dc))
-            shuffle(neighbors)
-            return neighbors
-
-        while active:
-            current = (
-                active[-1]
-                if np.random.rand() < self.backtrack_ratio
-                else choice(active)
-            )
-            neighbors = find_neighbors(*current, self.symbol_map["wall"])
+            if current >= w and not carved[current - w]:
+                neighbors.append(current - w)
+            if current < n - w and not carved[current + w]:
+                neighbors.append(current + w)
+            if col and not carved[current - 1]:
+                neighbors.append(current - 1)
+            if col < w - 1 and not carved[current + 1]:
+                neighbors.append(current + 1)
+
             if neighbors:
-                next_cell = choice(neighbors)
+                next_cell = (
+                    neighbors[int(uniform() * len(neighbors))]
+                    if len(neighbors) > 1
+                    else neighbors[0]
+                )
+                carved[next_cell] = 1
                 active.append(next_cell)
-                grid[next_cell] = self.symbol_map["cell"]
-                grid[
-                    (current[0] + next_cell[0]) // 2, (current[1] + next_cell[1]) // 2
-                ] = self.symbol_map["cell"]
+                passages.append(current)
+                passages.append(next_cell)
+                n_alive += 1
             else:
-                active.remove(current)
+                dead[current] = 1
+                n_alive -= 1
+
+        _carve(
+            grid, np.array(passages, dtype=np.int64).reshape(-1, 2), w, self.symbol_map
+        )
         return grid
 
 
-class Kruskal:
-    def __init__(self, symbol_map=None):
-        self.symbol_map = symbol_map
+class Kruskal(MazeGenerator):
+    def __init__(self, symbol_map=None, seed=None):
+        """
+        Generate perfect mazes with the randomized Kruskal's algorithm.
 
-    def __call__(self, h, w):
-        assert self.symbol_map is not None
+        Parameters:
+            `symbol_map` (dict, optional):
+                A map from "wall" and "cell" to the symbols used in the grid.
+            `seed` (int or np.random.Generator, optional):
+                Seed of the random generator. The same seed generates the same sequence of mazes.
+        """
+        super().__init__(symbol_map, seed)
+
+    def _generate(self, h, w, rng):
         H, W = 2 * h + 1, 2 * w + 1
         grid = np.full((H, W), self.symbol_map["wall"], dtype=np.int8)
+        grid[1:-1:2, 1:-1:2] = self.symbol_map["cell"]
 
-        parent = {}
-        rank = {}
-
-        def find(x):
-            if parent[x] != x:
-                parent[x] = find(parent[x])
-            return parent[x]
-
-        def union(x, y):
-            root1 = find(x)
-            root2 = find(y)
-            if root1 != root2:
-                if rank[root1] > rank[root2]:
-                    parent[root2] = root1
-                elif rank[root1] < rank[root2]:
-                    parent[root1] = root2
-                else:
-                    parent[root2] = root1
-                    rank[root1] += 1
-
-        for row in range(1, H, 2):
-            for col in range(1, W, 2):
-                cell = (row, col)
-                parent[cell] = cell
-                rank[cell] = 0
-                grid[row, col] = self.symbol_map["cell"]
-
-        edges = []
-        for row in range(1, H, 2):
-            for col in range(1, W, 2):
-                if row < H - 2:
-                    edges.append(((row, col), (row + 2, col)))
-                if col < W - 2:
-                    edges.append(((row, col), (row, col + 2)))
-
-        shuffle(edges)
-
-        while edges:
-            (cell1, cell2) = edges.pop()
-            if find(cell1) != find(cell2):
-                union(cell1, cell2)
-                grid[(cell1[0] + cell2[0]) // 2, (cell1[1] + cell2[1]) // 2] = (
-                    self.symbol_map["cell"]
-                )
+        cells = np.arange(h * w).reshape(h, w)
+        src = np.concatenate([cells[:-1, :].ravel(), cells[:, :-1].ravel()])
+        dst = np.concatenate([cells[1:, :].ravel(), cells[:, 1:].ravel()])
 
+        # Kruskal's algorithm over edges in random order is the minimum spanning tree
+        # of random edge weights, which csgraph computes with a compiled union-find.
+        # Weights are shifted away from 0 since csgraph treats 0 as a missing edge.
+        weights = 1.0 + rng.random(len(src))
+        tree = minimum_spanning_tree(
+            coo_array((weights, (src, dst)), shape=(h * w, h * w))
+        ).tocoo()
+        _carve(grid, np.stack([tree.row, tree.col], axis=1), w, self.symbol_map)
         return grid
 
 
-class RecursiveDivision:
+class RecursiveDivision(MazeGenerator):
     VERTICAL = 0
     HORIZONTAL = 1
 
-    def __init__(self, symbol_map=None):
-        self.symbol_map = symbol_map
+    def __init__(self, symbol_map=None, seed=None):
+        """
+        Generate perfect mazes by recursively dividing chambers with walls that have one door.
 
-    def __call__(self, h, w):
-        assert self.symbol_map is not None
+        Parameters:
+            `symbol_map` (dict, optional):
+                A map from "wall" and "cell" to the symbols used in the grid.
+            `seed` (int or np.random.Generator, optional):
+                Seed of the random generator. The same seed generates the same sequence of mazes.
+        """
+        super().__init__(symbol_map, seed)
+
+    def _generate(self, h, w, rng):
         H, W = 2 * h + 1, 2 * w + 1
+        uniform = _uniform(rng)
+
+        def randrange(start, stop, step=1):
+            return start + step * int(uniform() * ((stop - start + step - 1) // step))
+
         grid = np.full((H, W), self.symbol_map["cell"], dtype=np.int8)
         grid[0, :] = grid[-1, :] = self.symbol_map["wall"]
         grid[:, 0] = grid[:, -1] = self.symbol_map["wall"]
 
-        def divide(min_y, max_y, min_x, max_x):
+        wall, cell = self.symbol_map["wall"], self.symbol_map["cell"]
+        # chambers left to divide. The second half of a chamber is pushed first so that
+        # chambers are divided in the same order as a depth-first recursion would.
+        chambers = [(1, H - 2, 1, W - 2)]
+        while chambers:
+            min_y, max_y, min_x, max_x = chambers.pop()
             height = max_y - min_y + 1
             width = max_x - min_x + 1
 
             if height <= 1 or width <= 1:
-                return
+                continue
 
             if width < height:
                 cut_direction = self.HORIZONTAL
@@ -127,30 +289,27 @@ class RecursiveDivision:
                 cut_direction = self.VERTICAL
             else:
                 if width == 2:
-                    return
-                cut_direction = randrange(2)
+                    continue
+                cut_direction = randrange(0, 2)
 
             cut_length = (height, width)[(cut_direction + 1) % 2]
             if cut_length < 3:
-                return
+                continue
 
             cut_pos = randrange(1, cut_length, 2)
             door_pos = randrange(0, (height, width)[cut_direction], 2)
 
             if cut_direction == self.VERTICAL:
-                for row in range(min_y, max_y + 1):
-                    grid[row, min_x + cut_pos] = self.symbol_map["wall"]
-                grid[min_y + door_pos, min_x + cut_pos] = self.symbol_map["cell"]
+                grid[min_y : max_y + 1, min_x + cut_pos] = wall
+                grid[min_y + door_pos, min_x + cut_pos] = cell
 
-                divide(min_y, max_y, min_x, min_x + cut_pos - 1)
-                divide(min_y, max_y, min_x + cut_pos + 1, max_x)
+                chambers.append((min_y, max_y, min_x + cut_pos + 1, max_x))
+                chambers.append((min_y, max_y, min_x, min_x + cut_pos - 1))
             else:
-                for col in range(min_x, max_x + 1):
-                    grid[min_y + cut_pos, col] = self.symbol_map["wall"]
-                grid[min_y + cut_pos, min_x + door_pos] = self.symbol_map["cell"]
+                grid[min_y + cut_pos, min_x : max_x + 1] = wall
+                grid[min_y + cut_pos, min_x + door_pos] = cell
 
-                divide(min_y, min_y + cut_pos - 1, min_x, max_x)
-                divide(min_y + cut_pos + 1, max_y, min_x, max_x)
+                chambers.append((min_y + cut_pos + 1, max_y, min_x, max_x))
+                chambers.append((min_y, min_y + cut_pos - 1, min_x, max_x))
 
-        divide(1, H - 2, 1, W - 2)
         return grid
@@ -0,0 +1,136 @@
+import numpy as np
+from scipy.sparse.csgraph import breadth_first_order, connected_components
+from sklearn.cluster import SpectralClustering
+from .graph import adjacency_matrix
+from ..config import register
+
+
+@register.maze_partitioner("spectral")
+class SpectralPartitioner:
+    def __init__(
+        self,
+        sparse=True,
+        n_init=100,
+        assign_labels="discretize",
+        eigen_solver=None,
+        random_state=None,
+    ) -> None:
+        """
+        Partition a maze graph with spectral clustering.
+
+        Parameters:
+            `sparse` (bool, optional):
+                Whether to pass the adjacency matrix to `SpectralClustering` as a sparse matrix.
+                A dense matrix takes memory quadratic in the number of cells. Defaults to True.
+            `n_init`, `assign_labels`, `eigen_solver`, `random_state`:
+                Passed to `sklearn.cluster.SpectralClustering`.
+        """
+        self.sparse = sparse
+        self.n_init = n_init
+        self.assign_labels = assign_labels
+        self.eigen_solver = eigen_solver
+        self.random_state = random_state
+
+    def __call__(self, graph, n_parts):
+        adjacency = adjacency_matrix(graph)
+        if not self.sparse:
+            adjacency = adjacency.toarray()
+        sc = SpectralClustering(
+            n_clusters=n_parts,
+            affinity="precomputed",
+            n_init=self.n_init,
+            assign_labels=self.assign_labels,
+            eigen_solver=self.eigen_solver,
+            random_state=self.random_state,
+        )
+        sc.fit(adjacency)
+        return sc.labels_
+
+
+@register.maze_partitioner("tree")
+class TreePartitioner:
+    """
+    Cut a maze graph into connected parts of balanced size in linear time.
+
+    Perfect mazes are spanning trees of their cells. The partitioner walks a BFS tree of the
+    graph from the leaves up and cuts off a subtree whenever it is about the target size of
+    the remaining parts, so every part is a connected subtree. For graphs with cycles the
+    parts are subtrees of the BFS tree and are still connected.
+
+    Parts are only roughly balanced, as a subtree is either cut or merged whole into its
+    parent. On 100x100 `GrowingTree` mazes cut into 3 to 16 parts, the largest part is on
+    average 1.2 times the ideal size `n_nodes / n_parts` and at most about 1.5 times, and 1.5
+    times the smallest part on average and up to about 2.8 times.
+    """
+
+    def __call__(self, graph, n_parts):
+        adjacency = adjacency_matrix(graph)
+        n_nodes = adjacency.shape[0]
+        if n_nodes < n_parts:
+            raise ValueError(
+                f"Cannot partition a graph of {n_nodes} nodes into {n_parts} parts."
+            )
+        if connected_components(adjacency, directed=False, return_labels=False) > 1:
+            raise ValueError("The tree partitioner requires a connected graph.")
+
+        labels = self._cut(adjacency, n_parts)
+        n_labels = labels.max() + 1
+        # a subtree may overshoot its target and leave too few nodes for the last parts
+        while n_labels < n_parts:
+            largest = np.flatnonzero(labels == np.bincount(labels).argmax())
+            labels[largest[self._bisect(adjacency[largest][:, largest])]] = n_labels
+            n_labels += 1
+        return labels
+
+    def _tree(self, adjacency):
+        order, parent = breadth_first_order(
+            adjacency, 0, directed=False, return_predecessors=True
+        )
+        return order.tolist(), parent.tolist()
+
+    def _bisect(self, adjacency):
+        """
+        Return a mask of the subtree whose size is closest to half of the tree.
+        """
+        order, parent = self._tree(adjacency)
+        size = [1] * len(order)
+        for node in reversed(order[1:]):
+            size[parent[node]] += size[node]
+        sizes = np.array(size)
+        sizes[order[0]] = 0  # the root is the whole tree
+        cut = np.abs(2 * sizes - len(order)).argmin()
+
+        mask = np.zeros(len(order), dtype=bool)
+        mask[cut] = True
+        for node in order:
+            if node != cut and parent[node] >= 0 and mask[parent[node]]:
+                mask[node] = True
+        return mask
+
+    def _cut(self, adjacency, n_parts):
+        order, parent = self._tree(adjacency)
+        size = [1] * len(order)
+        part = [-1] * len(order)
+
+        remaining, n_cut = len(order), 0
+        for node in reversed(order[1:]):
+            target = remaining / (n_parts - n_cut)
+            merged = size[node] + size[parent[node]]
+            # cut the subtree once it reaches the target, or when merging it into its
+            # parent would overshoot the target further than the subtree falls short of it
+            if n_cut < n_parts - 1 and (
+                size[node] >= target
+                or (merged > target and target - size[node] < merged - target)
+            ):
+                part[node] = n_cut
+                remaining -= size[node]
+                n_cut += 1
+            else:
+                size[parent[node]] = merged
+
+        root = order[0]
+        part[root] = n_cut
+        for node in order[1:]:
+            if part[node] < 0:
+                part[node] = part[parent[node]]
+        return np.array(part)
@@ -0,0 +1,173 @@
+import colorsys
+import os
+import random
+import struct
+import zlib
+import numpy as np
+
+VIDEO_EXTENSIONS = (".mp4", ".gif", ".avi", ".mov", ".mkv", ".webm")
+
+
+def default_cmap(env, cmap=None):
+    """
+    Fill in the default colours of a maze colour map: dark walls, grey cells, white visited
+    cells and a colour of evenly spaced hue for every agent of `env`.
+
+    Parameters:
+        `env` (MazeCleanEnv):
+            The environment whose agents are coloured.
+        `cmap` (dict, optional):
+            A map from symbol names, e.g. "wall" or "agent1", to RGB tuples. Colours it already
+            has are kept. It is updated in place.
+
+    Returns:
+        The colour map.
+    """
+    cmap = cmap if cmap is not None else {}
+    cmap.setdefault("wall", (10, 10, 10))
+    cmap.setdefault("cell", (170, 175, 175))
+    cmap.setdefault("visited", (255, 255, 255))
+    for i, agent in enumerate(env.agents):
+        hue = i / env.n_agents
+        saturation = 0.7 + 0.3 * random.random()
+        lightness = 0.4 + 0.4 * random.random()
+        r, g, b = colorsys.hls_to_rgb(hue, lightness, saturation)
+        cmap.setdefault(f"agent{agent.id}", (int(r * 255), int(g * 255), int(b * 255)))
+    return cmap
+
+
+def cell_color(cmap, name):
+    """
+    Return the colour of a symbol name. Agents without their own colour use the colour of "agent".
+    """
+    if name.startswith("agent") and name not in cmap:
+        return cmap["agent"]
+    return cmap[name]
+
+
+def color_lut(cmap, digit_symbol_map):
+    """
+    Build a colour lookup table of the symbols of a maze.
+
+    Returns:
+        A tuple `(lut, offset)`. `lut` is an `(n, 3)` uint8 array whose row `symbol - offset`
+        is the colour of `symbol`.
+    """
+    digits = list(digit_symbol_map)
+    offset = min(digits)
+    lut = np.zeros((max(digits) - offset + 1, 3), dtype=np.uint8)
+    for digit, name in digit_symbol_map.items():
+        lut[digit - offset] = cell_color(cmap, name)
+    return lut, offset
+
+
+def write_png(path, frame, compression=6):
+    """
+    Write an `(H, W, 3)` uint8 RGB array to a PNG file.
+    """
+    frame = np.ascontiguousarray(frame, dtype=np.uint8)
+    height, width, _ = frame.shape
+    # every scanline starts with its filter type, 0 is no filter
+    raw = np.zeros((height, 1 + 3 * width), dtype=np.uint8)
+    raw[:, 1:] = frame.reshape(height, -1)
+
+    def chunk(tag, data):
+        return (
+            struct.pack(">I", len(data))
+            + tag
+            + data
+            + struct.pack(">I", zlib.crc32(tag + data))
+        )
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), compression)))
+        f.write(chunk(b"IEND", b""))
+
+
+class FrameRenderer:
+    def __init__(self, env, cmap=None, scale=1) -> None:
+        """
+        Render the state of a `MazeCleanEnv` to RGB arrays without a display.
+
+        Parameters:
+            `env` (MazeCleanEnv):
+                The environment to render.
+            `cmap` (dict, optional):
+                A map from symbol names to RGB tuples, completed with `default_cmap` like the colour
+                map of `MazeWindow`.
+            `scale` (int, optional):
+                The size of a maze cell in pixels. Defaults to 1.
+        """
+        self.env = env
+        self.cmap = default_cmap(env, cmap)
+        self.scale = scale
+        self._lut = self._offset = None
+        self._digit_symbol_map = None
+
+    def render(self):
+        """
+        Return the current frame as an `(H * scale, W * scale, 3)` uint8 array.
+        """
+        if self._digit_symbol_map is not self.env.digit_symbol_map:
+            self._digit_symbol_map = self.env.digit_symbol_map
+            self._lut, self._offset = color_lut(self.cmap, self._digit_symbol_map)
+        maze = self.env.maze
+        frame = self._lut[
+            np.subtract(maze, self._offset, dtype=np.intp) if self._offset else maze
+        ]
+        if self.scale > 1:
+            frame = frame.repeat(self.scale, axis=0).repeat(self.scale, axis=1)
+        return frame
+
+    def save(self, path):
+        """
+        Write the current frame to a PNG file.
+        """
+        write_png(path, self.render())
+
+    def record(self, path, max_steps=None, fps=10):
+        """
+        Step the environment until it finishes or `max_steps` steps are taken, recording a frame
+        before the first step and after every step.
+
+        Parameters:
+            `path` (str):
+                A video file, whose extension is one of `VIDEO_EXTENSIONS`, or a directory to write a
+                `frame_00000.png`, `frame_00001.png`, ... sequence into. Videos need `imageio`.
+            `max_steps` (int, optional):
+                The maximum number of steps. Defaults to running until the environment finishes.
+            `fps` (int, optional):
+                The frame rate of videos. Defaults to 10.
+
+        Returns:
+            The number of steps taken.
+        """
+        if path.lower().endswith(VIDEO_EXTENSIONS):
+            try:
+                import imageio.v2 as imageio
+            except ImportError as e:
+                raise ImportError(
+                    "Recording videos requires imageio, install it with `pip install imageio[ffmpeg]`"
+                ) from e
+            with imageio.get_writer(path, fps=fps) as writer:
+                return self._record(writer.append_data, max_steps)
+
+        os.makedirs(path, exist_ok=True)
+        n_frames = 0
+
+        def write(frame):
+            nonlocal n_frames
+            write_png(os.path.join(path, f"frame_{n_frames:05d}.png"), frame)
+            n_frames += 1
+
+        return self._record(write, max_steps)
+
+    def _record(self, write, max_steps):
+        n_steps = 0
+        write(self.render())
+        while (max_steps is None or n_steps < max_steps) and self.env.step():
+            n_steps += 1
+            write(self.render())
+        return n_steps
@@ -1 +1,3 @@
-from .search import SearchSolver
\ No newline at end of file
+from .plan import Plan
+from .search import SearchSolver
+from .tour import TourSplitSolver
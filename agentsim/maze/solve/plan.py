@@ -0,0 +1,127 @@
+import numpy as np
+from ..cleaner import Action
+
+IDLE = -1
+
+# action of every value of `Plan.actions`
+ACTIONS = list(Action)
+
+# action moving an agent by a (row, col) offset
+DIRECTION_ACTIONS = {
+    (0, 1): Action.MoveRight,
+    (1, 0): Action.MoveDown,
+    (0, -1): Action.MoveLeft,
+    (-1, 0): Action.MoveUp,
+}
+
+# `DIRECTION_ACTIONS` indexed by `3 * (row offset + 1) + col offset + 1`, staying is idle
+_OFFSET_ACTIONS = np.full(9, IDLE, dtype=np.int8)
+for (_row, _col), _action in DIRECTION_ACTIONS.items():
+    _OFFSET_ACTIONS[3 * (_row + 1) + _col + 1] = _action.value
+
+
+def path_actions(path):
+    """
+    Return the int8 actions moving an agent along `path`, a sequence of `(row, col)` positions
+    of consecutive steps. Repeated positions are `IDLE`.
+    """
+    path = np.asarray(path, dtype=np.int64).reshape(-1, 2)
+    offsets = np.diff(path, axis=0)
+    return _OFFSET_ACTIONS[3 * (offsets[:, 0] + 1) + offsets[:, 1] + 1]
+
+
+class Plan:
+    def __init__(self, ids, starts, actions, orders=None) -> None:
+        """
+        The actions of a group of agents over a whole episode, compiled once by a solver.
+
+        At the first step every agent is placed at its start, and at step `t > 0` agent `i` takes
+        the action `actions[i, t - 1]`. Plans only hold arrays, so they can be cached, reused across
+        episodes on the same maze and saved for batch evaluation.
+
+        Parameters:
+            `ids` (list):
+                The ids of the agents.
+            `starts` (np.ndarray):
+                A `(k, 2)` array of the `(row, col)` start position of every agent.
+            `actions` (np.ndarray):
+                A `(k, T)` int8 array of `Action` values, `IDLE` if the agent waits.
+            `orders` (np.ndarray, optional):
+                A `(T, k)` array whose row `t - 1` lists the agents in the order they act at step
+                `t`, so that an agent leaving a cell moves before the one entering it. Defaults to
+                the order of `ids`.
+        """
+        self.ids = [int(id) for id in ids]
+        self.starts = np.asarray(starts, dtype=np.int64).reshape(len(self.ids), 2)
+        actions = np.asarray(actions, dtype=np.int8)
+        self.actions = (
+            actions.reshape(len(self.ids), -1) if self.ids else actions.reshape(0, 0)
+        )
+        self.orders = (
+            None
+            if orders is None
+            else np.asarray(orders, dtype=np.int32).reshape(-1, len(self.ids))
+        )
+        # `actions` and `orders` as lists, which are faster to index one by one
+        self._rows = self._orders = None
+
+    def step(self, t):
+        """
+        Return the `(id, action, kwargs)` messages of step `t`, skipping idle agents.
+        """
+        if t == 0:
+            return [
+                (id, Action.Place, {"position": tuple(start)})
+                for id, start in zip(self.ids, self.starts.tolist())
+            ]
+        if self._rows is None:
+            self._rows = self.actions.tolist()
+            if self.orders is not None:
+                self._orders = self.orders.tolist()
+        ids, rows = self.ids, self._rows
+        if self._orders is None:
+            return [
+                (id, ACTIONS[row[t - 1]], {})
+                for id, row in zip(ids, rows)
+                if row[t - 1] != IDLE
+            ]
+        return [
+            (ids[i], ACTIONS[rows[i][t - 1]], {})
+            for i in self._orders[t - 1]
+            if rows[i][t - 1] != IDLE
+        ]
+
+    def __iter__(self):
+        """
+        Yield the messages of every step in the format of solver generators.
+        """
+        for t in range(len(self)):
+            yield [
+                {"id": id, "action": action, **kwargs}
+                for id, action, kwargs in self.step(t)
+            ]
+
+    def __len__(self):
+        """
+        The number of steps, including the one placing the agents.
+        """
+        return self.actions.shape[1] + 1 if self.ids else 0
+
+    def save(self, path):
+        """
+        Save the plan to a `.npz` file.
+        """
+        arrays = {"ids": self.ids, "starts": self.starts, "actions": self.actions}
+        if self.orders is not None:
+            arrays["orders"] = self.orders
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["ids"],
+                data["starts"],
+                data["actions"],
+                data["orders"] if "orders" in data else None,
+            )
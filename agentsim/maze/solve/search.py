@@ -1,91 +1,88 @@
 import networkx as nx
-from ..cleaner import Action, Cleaner
+import numpy as np
+from ..cleaner import Cleaner
+from ..graph import MazeGraph
 from ...config import register
+from .plan import Plan, path_actions
+
+
+def depth_first_tour(g):
+    """
+    Return the nodes that an agent walks through to visit every node of the tree `g` depth first.
+
+    The walk starts from an end of a longest path of the tree. Subtrees are visited from the
+    shallowest to the deepest, so the deepest one is left last, and the walk stops at the last node
+    visited for the first time instead of coming back.
+    """
+    start_node = None
+    for node, deg in g.degree():
+        if deg == 1:  # bfs from a leaf node to obtain diameter of the tree
+            if isinstance(g, MazeGraph):
+                start_node = g.farthest(node)
+            else:
+                path_lengths = nx.single_source_shortest_path_length(g, node)
+                start_node = max(path_lengths, key=path_lengths.get)
+            break
+    if start_node is None:
+        # a single cell, or nothing to clean
+        return list(g)[:1]
+
+    # dfs graph g to get the children and depth of each node
+    children = {}
+    depths = {}
+    stack = [(start_node, None, 0)]
+    while stack:
+        node, parent, state = stack.pop()
+        if state == 0:
+            children[node] = [nbr for nbr in g.neighbors(node) if nbr != parent]
+            stack.append((node, parent, 1))
+            stack.extend((nbr, node, 0) for nbr in children[node])
+        else:
+            depths[node] = max((depths[nbr] + 1 for nbr in children[node]), default=0)
+
+    # dfs to walk the tree, stopping at the last node visited for the first time
+    n_nodes = len(children)
+    tour = [start_node]
+    n_visited = 1
+    path = [start_node]
+    stack = [iter(sorted(children[start_node], key=depths.__getitem__))]
+    while stack and n_visited < n_nodes:
+        nbr = next(stack[-1], None)
+        if nbr is None:
+            stack.pop()
+            path.pop()
+            tour.append(path[-1])
+            continue
+        n_visited += 1
+        tour.append(nbr)
+        path.append(nbr)
+        stack.append(iter(sorted(children[nbr], key=depths.__getitem__)))
+    return tour
+
 
 @register.maze_solver("search")
 class SearchSolver:
+    # plans only depend on the graph, so the environment may precompute and reuse them
+    cacheable = True
+
     def __init__(self, **kwargs) -> None:
         pass
 
     def get_agents(self, n_agents):
         return [Cleaner(i) for i in range(1, n_agents + 1)]
 
-
     def solver(self, g, agents):
+        yield from self.compile(g, agents)
+
+    def compile(self, g, agents):
+        """
+        Compile the walk of `depth_first_tour` by a single agent into a `Plan`.
+        """
         if len(agents) != 1:
             raise ValueError(
                 "The search algorithm doesn't support multiple agents in a graph."
             )
-        for node, deg in g.degree():
-            if deg == 1:  # bfs from a leaf node to obtain diameter of the tree
-                path_lengths = nx.single_source_shortest_path_length(g, node)
-                start_node = max(path_lengths, key=path_lengths.get)
-                yield [{"id": agents[0].id, "action": Action.Place, "position": start_node}]
-                break
-
-        dir_act_map = {
-            (0, 1): Action.MoveRight,
-            (1, 0): Action.MoveDown,
-            (0, -1): Action.MoveLeft,
-            (-1, 0): Action.MoveUp,
-        }
-
-        # dfs graph g to get depth of each node
-        depths = {}
-        stack = [(start_node, None, 0)]
-        while stack:
-            node, parent, state = stack.pop()
-            if state == 0:
-                depths[node] = 0
-                stack.append((node, parent, 1))
-                for nbr in g.neighbors(node):
-                    if nbr != parent:
-                        stack.append((nbr, node, 0))
-            elif state == 1:
-                for nbr in g.neighbors(node):
-                    if nbr != parent:
-                        depths[node] = max(depths[node], depths[nbr] + 1)
-
-        # dfs to generate actions
-        visited = set()
-        stack = [
-            (
-                start_node,
-                iter(sorted(g.neighbors(start_node), key=lambda x: depths[x])),
-            )
-        ]
-
-        while stack:
-            node, nbrs = stack[-1]
-            if node not in visited:
-                visited.add(node)
-
-            try:
-                nbr = next(nbrs)
-                if nbr not in visited:
-                    yield [
-                        {
-                            "id": agents[0].id,
-                            "action": dir_act_map[tuple(a - b for a, b in zip(nbr, node))],
-                        }
-                    ]
-                    stack.append(
-                        (
-                            nbr,
-                            iter(sorted(g.neighbors(nbr), key=lambda x: depths[x])),
-                        )
-                    )
-            except StopIteration:
-                stack.pop()
-                if len(visited) == g.number_of_nodes():
-                    return
-                if stack:
-                    parent_node = stack[-1][0]
-                    yield [
-                        {
-                            "id": agents[0].id,
-                            "action": dir_act_map[
-                                tuple(a - b for a, b in zip(parent_node, node))
-                            ],
-                        }
-                    ]
+        tour = depth_first_tour(g)
+        if not tour:
+            return Plan([], np.empty((0, 2)), [])
+        return Plan([agents[0].id], tour[:1], [path_actions(tour)])
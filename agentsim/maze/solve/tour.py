@@ -0,0 +1,140 @@
+from collections import deque
+import numpy as np
+from ..cleaner import Cleaner
+from ...config import register
+from .plan import Plan, path_actions
+from .search import depth_first_tour
+
+
+def split_tour(tour, k):
+    """
+    Split a walk visiting every node into at most `k` contiguous segments minimizing the length of
+    the longest one.
+
+    A segment only has to go from the first to the last node that it visits for the first time in
+    the walk, as the other nodes are visited by earlier segments.
+
+    Returns:
+        A list of `(begin, end)` index ranges of `tour`, both included, whose first nodes are
+        distinct.
+    """
+    seen = set()
+    firsts = []  # indices of the first visits of nodes
+    for i, node in enumerate(tour):
+        if node not in seen:
+            seen.add(node)
+            firsts.append(i)
+    firsts = np.array(firsts)
+
+    def greedy(limit):
+        segments = []
+        begin = 0
+        while begin < len(firsts):
+            # the last first visit within `limit` steps of the beginning of the segment
+            end = np.searchsorted(firsts, firsts[begin] + limit, side="right") - 1
+            segments.append((firsts[begin].item(), firsts[end].item()))
+            begin = end + 1
+        return segments
+
+    # binary search the smallest longest segment that `k` segments can reach
+    low, high = 0, len(tour)
+    while low < high:
+        middle = (low + high) // 2
+        if len(greedy(middle)) <= k:
+            high = middle
+        else:
+            low = middle + 1
+    return greedy(low)
+
+
+@register.maze_solver("tour_split")
+class TourSplitSolver:
+    cacheable = True
+
+    def __init__(self, **kwargs) -> None:
+        pass
+
+    def get_agents(self, n_agents):
+        return [Cleaner(i) for i in range(1, n_agents + 1)]
+
+    def solver(self, g, agents):
+        yield from self.compile(g, agents)
+
+    def compile(self, g, agents):
+        """
+        Compile a walk of the tree `g` shared by several agents into a `Plan`.
+
+        The walk of `depth_first_tour` is split into segments of similar length with `split_tour`,
+        and every agent is placed at the beginning of its segment and walks along it. Agents are
+        simulated step by step so they never collide:
+        - an agent waits if the next cell of its segment is taken;
+        - an agent blocked by a finished agent hands the rest of its segment over to it and stops;
+        - two agents facing each other swap the rest of their segments instead of passing;
+        - an agent leaving a cell acts before the one entering it.
+        """
+        if not agents:
+            raise ValueError("The tour_split algorithm needs an agent in every graph.")
+        tour = depth_first_tour(g)
+        if not tour:
+            return Plan([], np.empty((0, 2)), [])
+        segments = split_tour(tour, len(agents))
+        agents = agents[: len(segments)]  # the others aren't needed
+        positions = [tour[begin] for begin, _ in segments]
+        paths = [deque(tour[begin + 1 : end + 1]) for begin, end in segments]
+        timelines = [[position] for position in positions]
+        orders = []
+        occupied = {position: i for i, position in enumerate(positions)}
+        remaining = sum(map(len, paths))
+        while remaining:
+            # hand segments over instead of passing through an agent
+            handed = set()
+            for i, path in enumerate(paths):
+                if not path or i in handed:
+                    continue
+                j = occupied.get(path[0])
+                if j is None or j in handed:
+                    continue
+                if not paths[j]:
+                    path.popleft()
+                    paths[i], paths[j] = deque(), path
+                elif paths[j][0] == positions[i]:
+                    path.popleft()
+                    paths[j].popleft()
+                    paths[i], paths[j] = paths[j], path
+                else:
+                    continue
+                handed.update((i, j))
+
+            # move the agents whose next cell is free, freeing their cells for the others
+            moved = []
+            waiting = [i for i, path in enumerate(paths) if path and i not in handed]
+            progress = True
+            while waiting and progress:
+                progress = False
+                still_waiting = []
+                for i in waiting:
+                    position = paths[i][0]
+                    if position in occupied:
+                        still_waiting.append(i)
+                        continue
+                    del occupied[positions[i]]
+                    occupied[position] = i
+                    positions[i] = paths[i].popleft()
+                    moved.append(i)
+                    progress = True
+                waiting = still_waiting
+            if not moved and not handed:
+                raise RuntimeError("The agents are deadlocked.")
+
+            for timeline, position in zip(timelines, positions):
+                timeline.append(position)
+            moving = set(moved)
+            orders.append(moved + [i for i in range(len(agents)) if i not in moving])
+            remaining = sum(map(len, paths))
+
+        return Plan(
+            [agent.id for agent in agents],
+            [timeline[0] for timeline in timelines],
+            [path_actions(timeline) for timeline in timelines],
+            orders,
+        )
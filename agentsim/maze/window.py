@@ -1,7 +1,11 @@
-from pyglet import shapes
+import numpy as np
+from pyglet import gl, shapes
+from pyglet.graphics import Group
+from pyglet.image import ImageData, Texture
+from pyglet.sprite import Sprite
 from pyglet.text import Label
 from ..window_base import WindowBase
-import colorsys, random
+from .render import cell_color, color_lut, default_cmap
 
 
 class MazeWindow(WindowBase):
@@ -12,35 +16,46 @@ class MazeWindow(WindowBase):
         solve_interval=0.1,
         run_on_show=True,
         *args,
+        render_mode="shapes",
         **kwargs,
     ):
+        # "shapes" draws a rectangle per cell, "texture" draws the maze as one texture with a
+        # texel per cell, which keeps large mazes cheap to draw and to update
+        if render_mode not in ["shapes", "texture"]:
+            raise ValueError(f"Unknown render mode {render_mode}")
+        self.render_mode = render_mode
         super().__init__(
             env, solve_interval, run_on_show, *args, **kwargs, resizable=True
         )
 
         # init for visualization
-        self.cmap = cmap if cmap is not None else {}
-        self.cmap.setdefault("wall", (10, 10, 10))
-        self.cmap.setdefault("cell", (170, 175, 175))
-        self.cmap.setdefault("visited", (255, 255, 255))
-        for i, agent in enumerate(env.agents):
-            hue = i / env.n_agents
-            saturation = 0.7 + 0.3 * random.random()
-            lightness = 0.4 + 0.4 * random.random()
-            r, g, b = colorsys.hls_to_rgb(hue, lightness, saturation)
-            self.cmap.setdefault(
-                f"agent{agent.id}", (int(r * 255), int(g * 255), int(b * 255))
-            )
+        self.cmap = default_cmap(env, cmap)
+        self._layout = None  # the window and maze size the cells are laid out for
+        self._digit_symbol_map = None
 
         self._init_batch()
 
     def _init_batch(self):
         num_rows, num_cols = self.env.maze.shape
 
-        self._grid = [[] for _ in range(num_rows)]
-        for row in range(num_rows):
-            for col in range(num_cols):
-                self._grid[row].append(shapes.Rectangle(1, 1, 1, 1, batch=self._batch))
+        # labels are drawn over the cells
+        background, foreground = Group(order=0), Group(order=1)
+        self._grid = None
+        self._sprite = None
+        if self.render_mode == "texture":
+            self._texture = Texture.create(
+                num_cols, num_rows, min_filter=gl.GL_NEAREST, mag_filter=gl.GL_NEAREST
+            )
+            self._sprite = Sprite(self._texture, batch=self._batch, group=background)
+        else:
+            self._grid = [[] for _ in range(num_rows)]
+            for row in range(num_rows):
+                for col in range(num_cols):
+                    self._grid[row].append(
+                        shapes.Rectangle(
+                            1, 1, 1, 1, batch=self._batch, group=background
+                        )
+                    )
 
         self._label = {
             str(agent.id): Label(
@@ -50,36 +65,110 @@ class MazeWindow(WindowBase):
                 color=(17, 19, 19, 255),
                 dpi=96,
                 batch=self._batch,
+                group=foreground,
             )
             for agent in self.env.agents
         }
 
     def _update_batch(self):
-        num_rows, num_cols = self.env.maze.shape
+        maze = self.env.maze
+        cells = self.env.pop_dirty_cells()
+        if (
+            cells is None
+            or self._layout != (self.width, self.height, maze.shape)
+            or self._digit_symbol_map is not self.env.digit_symbol_map
+        ):
+            self._relayout()
+            return
+        # only the cells that agents entered or left since the last update changed
+        if self.render_mode == "texture" and len(cells) > maze.shape[1]:
+            # one upload of the whole maze is cheaper than many single texels
+            self._upload(maze)
+            for row, col in cells:
+                self._move_label(row, col, maze[row, col])
+            return
+        for row, col in cells:
+            self._paint(row, col, maze[row, col])
+
+    def _relayout(self):
+        """
+        Lay out every cell for the current window size and repaint the whole maze.
+        """
+        maze = self.env.maze
+        num_rows, num_cols = maze.shape
         cell_size = min(self.width / num_cols, self.height / num_rows)
+        self._offset_x = (self.width - (cell_size * num_cols)) / 2
+        self._offset_y = (self.height - (cell_size * num_rows)) / 2
+        self._layout = (self.width, self.height, maze.shape)
+        self._cell_size = cell_size
 
-        offset_x = (self.width - (cell_size * num_cols)) / 2
-        offset_y = (self.height - (cell_size * num_rows)) / 2
-        # Draw each cell
-        for row in range(num_rows):
-            for col in range(num_cols):
-                cell_type = self.env.digit_symbol_map[self.env.maze[row, col]]
-                x = col * cell_size + offset_x
-                y = (num_rows - row - 1) * cell_size + offset_y
-                if cell_type.startswith("agent"):
-                    color = (
-                        self.cmap[cell_type]
-                        if cell_type in self.cmap
-                        else self.cmap["agent"]
-                    )
-                    agent_id = cell_type.split("agent")[1]
-                    self._label[agent_id].x = x + cell_size / 2
-                    self._label[agent_id].y = y + cell_size / 2
-                    self._label[agent_id].font_size = cell_size // 2
-                else:
-                    color = self.cmap[cell_type]
-                self._grid[row][col].x = x
-                self._grid[row][col].y = y
-                self._grid[row][col].width = cell_size
-                self._grid[row][col].height = cell_size
-                self._grid[row][col].color = color
+        self._digit_symbol_map = self.env.digit_symbol_map
+        self._colors = {
+            digit: cell_color(self.cmap, name)
+            for digit, name in self._digit_symbol_map.items()
+        }
+        self._lut, self._lut_offset = color_lut(self.cmap, self._digit_symbol_map)
+        self._agent_labels = {
+            digit: self._label[name.split("agent")[1]]
+            for digit, name in self._digit_symbol_map.items()
+            if name.startswith("agent") and name.split("agent")[1] in self._label
+        }
+        for label in self._label.values():
+            label.font_size = cell_size // 2
+            # shown once the agent is found in the maze, agents without a plan are never placed
+            label.visible = False
+
+        if self.render_mode == "texture":
+            self._sprite.x = self._offset_x
+            self._sprite.y = self._offset_y
+            self._sprite.scale = cell_size
+            self._upload(maze)
+            agent_cells = np.argwhere(np.isin(maze, list(self._agent_labels)))
+            for row, col in agent_cells.tolist():
+                self._move_label(row, col, maze[row, col])
+            return
+
+        for row, cells in enumerate(maze.tolist()):
+            y = (num_rows - row - 1) * cell_size + self._offset_y
+            for col, digit in enumerate(cells):
+                rect = self._grid[row][col]
+                rect.x = col * cell_size + self._offset_x
+                rect.y = y
+                rect.width = cell_size
+                rect.height = cell_size
+                self._paint(row, col, digit)
+
+    def _upload(self, maze):
+        """
+        Write the colours of every cell into the texture.
+        """
+        num_rows, num_cols = maze.shape
+        # texture rows start from the bottom
+        frame = self._lut[np.subtract(maze[::-1], self._lut_offset, dtype=np.intp)]
+        image = ImageData(num_cols, num_rows, "RGB", frame.tobytes())
+        self._texture.blit_into(image, 0, 0, 0)
+
+    def _paint(self, row, col, digit):
+        if self.render_mode == "texture":
+            texel = self._lut[int(digit) - self._lut_offset].tobytes()
+            row_from_bottom = self.env.maze.shape[0] - row - 1
+            self._texture.blit_into(
+                ImageData(1, 1, "RGB", texel), col, row_from_bottom, 0
+            )
+        else:
+            self._grid[row][col].color = self._colors[digit]
+        self._move_label(row, col, digit)
+
+    def _move_label(self, row, col, digit):
+        label = self._agent_labels.get(digit)
+        if label is not None:
+            num_rows = self.env.maze.shape[0]
+            label.x = self._offset_x + (col + 0.5) * self._cell_size
+            label.y = self._offset_y + (num_rows - row - 0.5) * self._cell_size
+            label.visible = True
+
+    def on_resize(self, width, height):
+        super().on_resize(width, height)
+        # pyglet resizes the window before `__init__` has created the cells
+        if getattr(self, "_layout", None) is not None:
+            self._relayout()
@@ -1,6 +1,17 @@
 from .env import PDGameEnv
 from .player import Cooperator, Copycat, QLearner, Fraud, Grudger
-from .window import PDGameWindow
+from .population import Population, PlayerView
+from .qtable import QTable
+
+
+def __getattr__(name):
+    # imported lazily like `agentsim.maze.MazeWindow`
+    if name == "PDGameWindow":
+        from .window import PDGameWindow
+
+        return PDGameWindow
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "PDGameEnv",
@@ -10,4 +21,7 @@ __all__ = [
     "QLearner",
     "Fraud",
     "Grudger",
+    "Population",
+    "PlayerView",
+    "QTable",
 ]
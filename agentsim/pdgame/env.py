@@ -1,11 +1,25 @@
+import numpy as np
 from pubsub import pub
-from ..config import SOLVER_TOPIC, AGENT_RESPONSED, ENV_UPDATED, register
+from ..config import ENV_UPDATED, register
 from ..simenv import SimEnv
-from .player import Action
+from .player import Action, QLearner
+from .qtable import QTable
+from .population import Population
+from .tournament import Tournament, n_rounds, round_pairs
 
 
 class PDGameEnv(SimEnv):
-    def __init__(self, reward_matrix, role_num_dict, n_replace, n_round=10) -> None:
+    def __init__(
+        self,
+        reward_matrix,
+        role_num_dict,
+        n_replace,
+        n_round=10,
+        engine="python",
+        n_workers=None,
+        seed=None,
+        population=False,
+    ) -> None:
         """
         Initialize the PDGameEnv environment.
 
@@ -26,20 +40,31 @@ class PDGameEnv(SimEnv):
 
             n_round (int, optional): The number of rounds each pair of agents will play in one step. Default is 10.
 
+            engine (str, optional): How the pairs of a step are played. "python" plays every iteration through
+                                    `make_decision` and publishes the actions. "vectorized" plays players with
+                                    state-transition tables (copycat, cooperator, fraud, grudger) and qlearners
+                                    all at once as NumPy arrays without publishing their actions, and falls back
+                                    to "python" for the others. The qlearners then share the Q-table `q_table`
+                                    and explore with a generator seeded with `seed`. Default is "python".
+
+            n_workers (int, optional): The number of worker processes that the pairs played through `make_decision`
+                                       are sharded across. Their actions aren't published. Call `close` to shut
+                                       the workers down. Default is to play in the current process.
+
+            seed (int, optional): Seed of the random generators of the agents. Every agent draws from its own
+                                  generator seeded with `seed` and its id, so the results don't depend on
+                                  `n_workers`. Default is unseeded.
+
+            population (bool, optional): Whether to store the agents in a struct-of-arrays `Population` rather than as
+                                         `Player` objects. `agents` then holds lightweight views of the population,
+                                         which don't subscribe to pubsub. Only player types with state-transition
+                                         tables are supported, and they are always played as arrays. Default is False.
+
         Raises:
-            ValueError: If the reward matrix size is incorrect.
+            ValueError: If the reward matrix size is incorrect, the engine is unknown, or a player type
+                        can't be stored in a population.
         """
         super().__init__()
-        self.agents = []
-        self.agent_id_map = {}
-        agent_id = 0
-        for name, num in role_num_dict.items():
-            for _ in range(num):
-                agent = register.player_registry[name](id=agent_id)
-                self.agents.append(agent)
-                self.agent_id_map[agent_id] = agent
-                agent_id += 1
-
         if (
             len(reward_matrix) != 2
             or len(reward_matrix[0]) != 2
@@ -49,8 +74,35 @@ class PDGameEnv(SimEnv):
                 "Wrong reward matrix size. It should be a 2x2x2 matrix which represents the rewards between two players in different two policies."
             )
 
+        if engine not in ["python", "vectorized"]:
+            raise ValueError(f"Unknown engine {engine}")
+
+        self.seed = seed
+        # learners of the vectorized engine share a Q-table so they are updated together
+        self.q_table = QTable() if engine == "vectorized" else None
+        self.population = (
+            Population(coin_dtype=np.asarray(reward_matrix).dtype)
+            if population
+            else None
+        )
+        self.agents = []
+        self.agent_id_map = {}
+        self._agent_index = {}  # agent id -> position in `agents`
+        self._next_id = 0
+        for name, num in role_num_dict.items():
+            for _ in range(num):
+                self._add_agent(register.player_registry[name])
+
         self.reward_matrix = reward_matrix
         self.n_round = n_round
+        self.engine = engine
+        self._tournament = Tournament(
+            reward_matrix,
+            n_round,
+            vectorize=engine == "vectorized" or population,
+            n_workers=n_workers,
+            seed=seed,
+        )
         self.n_replace = n_replace
         self.reset()
 
@@ -62,94 +114,103 @@ class PDGameEnv(SimEnv):
         pass
 
     def step(self):
-        pair_index = self._current_round % (
-            len(self._matching_pairs) // (self.n_agents // 2)
-        )
-        round_pairs = self._matching_pairs[
-            pair_index * (self.n_agents // 2) : (pair_index + 1) * (self.n_agents // 2)
-        ]
-
-        for agent1_id, agent2_id in round_pairs:
-            agent1 = self.agent_id_map[agent1_id]
-            agent2 = self.agent_id_map[agent2_id]
-            self.on_round[agent1_id] = agent2_id
-            self.on_round[agent2_id] = agent1_id
-
-            last_action1 = Action.Cooperate
-            last_action2 = Action.Cooperate
-            last_reward1 = 0
-            last_reward2 = 0
-
-            for _ in range(self.n_round):
-                action1 = agent1.make_decision(last_action2, last_reward1)
-                action2 = agent2.make_decision(last_action1, last_reward2)
-
-                if action1 == Action.Cooperate and action2 == Action.Cooperate:
-                    reward1, reward2 = self.reward_matrix[0][0]
-                elif action1 == Action.Cooperate and action2 == Action.Defect:
-                    reward1, reward2 = self.reward_matrix[0][1]
-                elif action1 == Action.Defect and action2 == Action.Cooperate:
-                    reward1, reward2 = self.reward_matrix[1][0]
-                else:
-                    reward1, reward2 = self.reward_matrix[1][1]
-
-                pub.sendMessage(
-                    SOLVER_TOPIC,
-                    id=agent1_id,
-                    action=action1,
-                    kwargs={},
-                )
-                pub.sendMessage(
-                    SOLVER_TOPIC,
-                    id=agent2_id,
-                    action=action2,
-                    kwargs={},
-                )
-
-                last_action1, last_action2 = action1, action2
-                last_reward1, last_reward2 = reward1, reward2
+        round_index = self._current_round % n_rounds(self.n_agents)
+        pairs = []
+        for i, j in round_pairs(self.n_agents, round_index).tolist():
+            agent1, agent2 = self.agents[i], self.agents[j]
+            self.on_round[agent1.id] = agent2.id
+            self.on_round[agent2.id] = agent1.id
+            pairs.append((agent1, agent2))
+        coins = self.observe().sum()
+        self._tournament.play(pairs)
+        reward = self.observe().sum() - coins
 
         self._current_round += 1
-        if (
-            self._current_round > 0
-            and self._current_round
-            % (len(self._matching_pairs) // (self.n_agents // 2))
-            == 0
-        ):
+        if self._current_round % n_rounds(self.n_agents) == 0:
             self._evolution()
+        self._reward = reward
         return True
 
+    def observe(self):
+        """
+        Return the coins of the agents, in the order of `agents`.
+        """
+        if self.population is not None:
+            return self.population.coins[[agent.slot for agent in self.agents]]
+        return np.array([agent.coins for agent in self.agents])
+
+    def reward(self):
+        """
+        Return the coins that the agents gained during the last step.
+        """
+        return self._reward
+
     def reset(self):
         self.on_round = {}
         self._current_round = 0
+        self._reward = 0
+        if self.population is not None:
+            self.population.reset()
+            return
         for agent in self.agents:
-            agent.execute(Action.Reset)
-        self._matching_pairs = []
-        for i in range(self.n_agents):
-            for j in range(i + 1, self.n_agents):
-                self._matching_pairs.append((self.agents[i].id, self.agents[j].id))
+            agent.perform(Action.Reset)
+
+    def close(self):
+        self._tournament.close()
+
+    def _add_agent(self, player_type):
+        agent_id = self._next_id
+        self._next_id += 1
+        if self.population is not None:
+            agent = self.population.add(player_type, agent_id)
+        elif self.q_table is not None and issubclass(player_type, QLearner):
+            agent = player_type(id=agent_id, q_table=self.q_table)
+        else:
+            agent = player_type(id=agent_id)
+        if self.population is None and self.seed is not None:
+            agent.rng = np.random.default_rng([self.seed, agent_id])
+        self._agent_index[agent_id] = len(self.agents)
+        self.agents.append(agent)
+        self.agent_id_map[agent_id] = agent
+        return agent
+
+    def _remove_agent(self, agent):
+        # swap the last agent into the slot of the removed one
+        index = self._agent_index.pop(agent.id)
+        last = self.agents.pop()
+        if last is not agent:
+            self.agents[index] = last
+            self._agent_index[last.id] = index
+        del self.agent_id_map[agent.id]
+        agent.terminate()
 
     def _evolution(self):
-        sorted_agents = sorted(self.agents, key=lambda x: x.coins)
-        best_agent_type = sorted_agents[-1].__class__
+        coins = self.observe()
+        # the last of the richest agents, and the n_replace poorest agents with ties broken
+        # by position, as a stable sort would pick them
+        best_agent = self.agents[len(coins) - 1 - np.argmax(coins[::-1])]
+        best_agent_type = (
+            best_agent.player_type
+            if self.population is not None
+            else best_agent.__class__
+        )
+        n_replace = min(self.n_replace, len(coins))
+        if n_replace > 0:
+            threshold = np.partition(coins, n_replace - 1)[n_replace - 1]
+            below = np.flatnonzero(coins < threshold)
+            ties = np.flatnonzero(coins == threshold)[: n_replace - len(below)]
+            selected = np.concatenate([below, ties])
+            selected = selected[np.lexsort((selected, coins[selected]))]
+        else:
+            selected = []
+        agents_to_remove = [self.agents[i] for i in selected]
+
         removed_agents = []
         new_agent_ids = []
-        for i in range(self.n_replace):
-            agent_to_remove = sorted_agents[i]
-            removed_agents.append((agent_to_remove.id, agent_to_remove.type))
-            agent_to_remove.terminate()
-            self.agents.remove(agent_to_remove)
-            del self.agent_id_map[agent_to_remove.id]
-            if agent_to_remove.id in self.on_round:
-                opponent_id = self.on_round.pop(agent_to_remove.id)
-                if opponent_id in self.on_round:
-                    del self.on_round[opponent_id]
-
-            new_agent_id = max(self.agent_id_map.keys()) + 1
-            new_agent = best_agent_type(id=new_agent_id)
-            self.agents.append(new_agent)
-            new_agent_ids.append(new_agent_id)
-            self.agent_id_map[new_agent_id] = new_agent
+        for agent in agents_to_remove:
+            removed_agents.append((agent.id, agent.type))
+            self._remove_agent(agent)
+            new_agent_ids.append(self._add_agent(best_agent_type).id)
 
         self.reset()
         pub.sendMessage(
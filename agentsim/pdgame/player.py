@@ -1,9 +1,8 @@
-from collections import defaultdict
 from enum import Enum
 from ..agent import Agent
 from ..config import register
+from .qtable import N_ACTIONS, QTable
 import numpy as np
-import random
 
 
 class Action(Enum):
@@ -11,10 +10,28 @@ class Action(Enum):
 
 
 class Player(Agent):
+    # Deterministic strategies can describe themselves as a finite-state machine so that
+    # PDGameEnv plays them as arrays. `transitions[state][opponent_action.value]` is the
+    # `(action, next_state)` taken in `state` after observing the opponent's last action,
+    # and `state` exposes the current state of a player. Players without transitions are
+    # played one by one through `make_decision`.
+    transitions = None
+
     def __init__(self, id) -> None:
         super().__init__(id)
+        # stochastic strategies draw from their own generator, so their decisions don't
+        # depend on the order in which the matches of other players are played
+        self.rng = np.random.default_rng()
         self.reset()
 
+    @property
+    def state(self):
+        return 0
+
+    @state.setter
+    def state(self, value):
+        pass
+
     def _execute(self, action, **kwargs):
         if action == Action.Reset:
             self.reset()
@@ -29,10 +46,15 @@ class Player(Agent):
 
     def terminate(self):
         self.reset()
+        super().terminate()
 
 
 @register.player("copycat")
 class Copycat(Player):
+    transitions = (
+        ((Action.Cooperate, 0), (Action.Cooperate, 1)),
+        ((Action.Defect, 0), (Action.Defect, 1)),
+    )
 
     def __init__(self, id) -> None:
         super().__init__(id)
@@ -41,6 +63,14 @@ class Copycat(Player):
         super().reset()
         self._last_opponent_aciton = Action.Cooperate
 
+    @property
+    def state(self):
+        return self._last_opponent_aciton.value
+
+    @state.setter
+    def state(self, value):
+        self._last_opponent_aciton = Action(value)
+
     def make_decision(self, *args, **kwargs):
         super().make_decision(*args, **kwargs)
         opponent_action, last_reward = args
@@ -51,47 +81,89 @@ class Copycat(Player):
 
 @register.player("qlearner")
 class QLearner(Player):
-    def __init__(self, id, alpha=0.1, gamma=0.9, epsilon=0.1):
+    def __init__(self, id, alpha=0.1, gamma=0.9, epsilon=0.1, q_table=None):
+        """
+        A player learning with tabular Q-learning. Its state is the last action of its opponent
+        and it chooses to cooperate or defect.
+
+        Parameters:
+            `id` (int):
+                The id of the player.
+            `alpha`, `gamma`, `epsilon` (float, optional):
+                The learning rate, the discount factor and the exploration rate.
+            `q_table` (QTable, optional):
+                The table to keep the Q-values in. Learners sharing a table are updated together
+                by the vectorized engine of `PDGameEnv`. Defaults to a table of its own.
+        """
+        self.table = q_table if q_table is not None else QTable(1)
+        self.slot = self.table.add()
         super().__init__(id)
         self.alpha = alpha
         self.gamma = gamma
         self.epsilon = epsilon
-        self.q_table = defaultdict(lambda: np.zeros(len(Action)))
-        self.last_state = None
-        self.last_action = None
+
+    @property
+    def q_table(self):
+        """
+        The `(state, action)` matrix of Q-values of this learner.
+        """
+        return self.table.values[self.slot]
+
+    @property
+    def last_state(self):
+        state = int(self.table.last_states[self.slot])
+        return Action(state) if state >= 0 else None
+
+    @property
+    def last_action(self):
+        if self.last_state is None:
+            return None
+        return Action(int(self.table.last_actions[self.slot]))
 
     def reset(self):
         super().reset()
-        self.last_state = None
-        self.last_action = None
+        self.table.last_states[self.slot] = -1
+
+    def terminate(self):
+        if self.slot is None:  # already terminated
+            return
+        super().terminate()
+        self.table.remove(self.slot)
+        self.slot = None
 
     def make_decision(self, *args, **kwargs):
         super().make_decision(*args, **kwargs)
         opponent_action, last_reward = args
-        state = (opponent_action,)
-        if random.uniform(0, 1) < self.epsilon:
-            action = random.choice(list(Action))
+        state = opponent_action.value
+        if self.rng.random() < self.epsilon:
+            action = int(self.rng.integers(N_ACTIONS))
         else:
-            action = Action(np.argmax(self.q_table[state]))
+            action = int(np.argmax(self.q_table[state]))
 
-        if self.last_state is not None and self.last_action is not None:
-            self.update_q_table(self.last_state, self.last_action, last_reward, state)
+        last_state = int(self.table.last_states[self.slot])
+        if last_state >= 0:
+            self.update_q_table(
+                last_state, int(self.table.last_actions[self.slot]), last_reward, state
+            )
 
-        self.last_state = state
-        self.last_action = action
-        return action
+        self.table.last_states[self.slot] = state
+        self.table.last_actions[self.slot] = action
+        return Action(action)
 
     def update_q_table(self, state, action, reward, next_state):
-        current_q = self.q_table[state][action.value]
-        max_future_q = np.max(self.q_table[next_state])
+        q_table = self.q_table
+        current_q = q_table[state, action]
+        max_future_q = np.max(q_table[next_state])
         new_q = (1 - self.alpha) * current_q + self.alpha * (
             reward + self.gamma * max_future_q
         )
-        self.q_table[state][action.value] = new_q
+        q_table[state, action] = new_q
 
 
 @register.player("cooperator")
 class Cooperator(Player):
+    transitions = (((Action.Cooperate, 0), (Action.Cooperate, 0)),)
+
     def __init__(self, id) -> None:
         super().__init__(id)
 
@@ -102,6 +174,8 @@ class Cooperator(Player):
 
 @register.player("fraud")
 class Fraud(Player):
+    transitions = (((Action.Defect, 0), (Action.Defect, 0)),)
+
     def __init__(self, id) -> None:
         super().__init__(id)
 
@@ -112,6 +186,11 @@ class Fraud(Player):
 
 @register.player("grudger")
 class Grudger(Player):
+    transitions = (
+        ((Action.Cooperate, 0), (Action.Defect, 1)),
+        ((Action.Defect, 1), (Action.Defect, 1)),
+    )
+
     def __init__(self, id) -> None:
         super().__init__(id)
 
@@ -119,8 +198,17 @@ class Grudger(Player):
         super().reset()
         self._opponent_cheated = False
 
+    @property
+    def state(self):
+        return int(self._opponent_cheated)
+
+    @state.setter
+    def state(self, value):
+        self._opponent_cheated = bool(value)
+
     def make_decision(self, *args, **kwargs):
         super().make_decision(*args, **kwargs)
-        if args == Action.Defect:
+        opponent_action, last_reward = args
+        if opponent_action == Action.Defect:
             self._opponent_cheated = True
         return Action.Cooperate if not self._opponent_cheated else Action.Defect
@@ -0,0 +1,159 @@
+import numpy as np
+from .player import Action
+
+
+class Population:
+    def __init__(self, capacity=64, coin_dtype=np.int64) -> None:
+        """
+        A struct-of-arrays store of players with state-transition tables.
+
+        Ids, type codes, coins and strategy states of the players are kept in contiguous
+        arrays indexed by slot. Slots of removed players are reused by new ones. Players are
+        exposed as `PlayerView` objects, which read and write the arrays and provide the
+        `Player` interface used by `PDGameEnv` and `PDGameWindow`.
+
+        Parameters:
+            `capacity` (int, optional):
+                The initial number of slots. The arrays grow as needed. Defaults to 64.
+            `coin_dtype` (np.dtype, optional):
+                The dtype of coins. Defaults to np.int64.
+        """
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.types = np.zeros(capacity, dtype=np.int16)
+        self.coins = np.zeros(capacity, dtype=coin_dtype)
+        self.states = np.zeros(capacity, dtype=np.int16)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.player_types = []
+        self._codes = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        self._size = 0
+
+    def add(self, player_type, id):
+        """
+        Add a player of `player_type`, a `Player` class with `transitions`, and return its view.
+        """
+        if player_type.transitions is None:
+            raise ValueError(
+                f"{player_type.__name__} has no state-transition table and can't be stored in a Population"
+            )
+        code = self._codes.get(player_type)
+        if code is None:
+            code = self._codes[player_type] = len(self.player_types)
+            self.player_types.append(player_type)
+
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self.ids[slot] = id
+        self.types[slot] = code
+        self.coins[slot] = 0
+        self.states[slot] = 0
+        self.alive[slot] = True
+        self._size += 1
+        return PlayerView(self, slot, id)
+
+    def remove(self, view):
+        """
+        Remove a player and free its slot.
+        """
+        if not view.is_alive:
+            return
+        self.alive[view.slot] = False
+        self.ids[view.slot] = -1
+        self._free.append(view.slot)
+        self._size -= 1
+
+    def reset(self):
+        """
+        Reset the coins and the strategy state of every player.
+        """
+        self.coins[:] = 0
+        self.states[:] = 0
+
+    def _grow(self):
+        capacity = len(self.ids)
+        new_capacity = max(2 * capacity, 1)
+        for name in ["ids", "types", "coins", "states", "alive"]:
+            old = getattr(self, name)
+            new = np.zeros(new_capacity, dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+        self.ids[capacity:] = -1
+        self._free.extend(range(new_capacity - 1, capacity - 1, -1))
+
+    def __len__(self):
+        return self._size
+
+
+class PlayerView:
+    """
+    A player stored in a `Population`. It provides the `Player` interface on top of the arrays
+    of the population, without subscribing to pubsub.
+    """
+
+    __slots__ = ("population", "slot", "id")
+
+    def __init__(self, population, slot, id) -> None:
+        self.population = population
+        self.slot = slot
+        self.id = id
+
+    @property
+    def player_type(self):
+        return self.population.player_types[self.population.types[self.slot]]
+
+    @property
+    def type(self):
+        return self.player_type.type
+
+    @property
+    def transitions(self):
+        return self.player_type.transitions
+
+    @property
+    def coins(self):
+        return self.population.coins[self.slot].item()
+
+    @coins.setter
+    def coins(self, value):
+        self.population.coins[self.slot] = value
+
+    @property
+    def state(self):
+        return int(self.population.states[self.slot])
+
+    @state.setter
+    def state(self, value):
+        self.population.states[self.slot] = value
+
+    @property
+    def is_alive(self):
+        # the slot may have been reused by another player since this one was removed
+        population = self.population
+        return bool(
+            population.alive[self.slot] and population.ids[self.slot] == self.id
+        )
+
+    def make_decision(self, *args, **kwargs):
+        opponent_action, last_reward = args
+        self.coins += last_reward
+        action, next_state = self.transitions[self.state][opponent_action.value]
+        self.state = next_state
+        return action
+
+    def execute(self, action, **kwargs):
+        return self.perform(action, **kwargs)
+
+    def perform(self, action, **kwargs):
+        if not self.is_alive:
+            raise RuntimeError(f"The current agent{self.id} is unavailable.")
+        if action == Action.Reset:
+            self.coins = 0
+            self.state = 0
+        return self.coins
+
+    def terminate(self):
+        self.population.remove(self)
+
+    def detach(self):
+        pass
@@ -0,0 +1,60 @@
+import numpy as np
+
+# learners observe the last action of their opponent and choose to cooperate or defect
+N_STATES = 2
+N_ACTIONS = 2
+
+
+class QTable:
+    def __init__(self, capacity=64) -> None:
+        """
+        A Q-table tensor shared by Q-learning players.
+
+        Every learner owns a slot, i.e. a `(state, action)` matrix in `values` and its last
+        state and action, so the learners of a round can be updated with batched NumPy
+        operations. Slots of removed learners are reused by new ones.
+
+        Parameters:
+            `capacity` (int, optional):
+                The initial number of slots. The arrays grow as needed. Defaults to 64.
+        """
+        self.values = np.zeros((capacity, N_STATES, N_ACTIONS))
+        self.last_states = np.full(capacity, -1, dtype=np.int8)  # -1 is no last state
+        self.last_actions = np.zeros(capacity, dtype=np.int8)
+        self.used = np.zeros(capacity, dtype=bool)
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def add(self):
+        """
+        Allocate a zeroed slot and return it.
+        """
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self.used[slot] = True
+        self.values[slot] = 0
+        self.last_states[slot] = -1
+        self.last_actions[slot] = 0
+        return slot
+
+    def remove(self, slot):
+        """
+        Free a slot.
+
+        Raises:
+            ValueError: If the slot is already free.
+        """
+        if not self.used[slot]:
+            raise ValueError(f"Slot {slot} of the Q-table is already free")
+        self.used[slot] = False
+        self._free.append(slot)
+
+    def _grow(self):
+        capacity = len(self.values)
+        new_capacity = max(2 * capacity, 1)
+        for name in ["values", "last_states", "last_actions", "used"]:
+            old = getattr(self, name)
+            new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+        self._free.extend(range(new_capacity - 1, capacity - 1, -1))
@@ -0,0 +1,390 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pubsub import pub
+from ..config import agent_topic
+from .player import Action, QLearner
+from .population import PlayerView
+
+
+def play_match(agent1, agent2, reward_matrix, n_round, notify=True):
+    """
+    Play `n_round` iterations of the prisoner's dilemma between two players.
+
+    Parameters:
+        `agent1`, `agent2` (Player):
+            The players. Their coins and strategy state are updated in place.
+        `reward_matrix` (list):
+            The 2x2x2 reward matrix, see `PDGameEnv`.
+        `n_round` (int):
+            The number of iterations.
+        `notify` (bool, optional):
+            Whether to publish every action to the topic of the agent taking it rather than
+            have the agent perform it directly. Defaults to True.
+    """
+    last_action1 = Action.Cooperate
+    last_action2 = Action.Cooperate
+    last_reward1 = 0
+    last_reward2 = 0
+
+    for _ in range(n_round):
+        action1 = agent1.make_decision(last_action2, last_reward1)
+        action2 = agent2.make_decision(last_action1, last_reward2)
+
+        if action1 == Action.Cooperate and action2 == Action.Cooperate:
+            reward1, reward2 = reward_matrix[0][0]
+        elif action1 == Action.Cooperate and action2 == Action.Defect:
+            reward1, reward2 = reward_matrix[0][1]
+        elif action1 == Action.Defect and action2 == Action.Cooperate:
+            reward1, reward2 = reward_matrix[1][0]
+        else:
+            reward1, reward2 = reward_matrix[1][1]
+
+        if notify:
+            pub.sendMessage(
+                agent_topic(agent1.id),
+                id=agent1.id,
+                action=action1,
+                kwargs={},
+            )
+            pub.sendMessage(
+                agent_topic(agent2.id),
+                id=agent2.id,
+                action=action2,
+                kwargs={},
+            )
+        else:
+            agent1.perform(action1)
+            agent2.perform(action2)
+
+        last_action1, last_action2 = action1, action2
+        last_reward1, last_reward2 = reward1, reward2
+
+
+def n_rounds(n_players):
+    """
+    Return the number of rounds of a round-robin in which every player meets every other once.
+    """
+    return n_players - 1 if n_players % 2 == 0 else n_players
+
+
+def round_pairs(n_players, r):
+    """
+    Return the pairs of round `r` of a round-robin between `n_players` players, scheduled with
+    the circle method: player 0 stays in place while the others rotate one seat per round, and
+    seat i plays the seat facing it. Every player plays once per round, except one player who
+    sits out each round when `n_players` is odd.
+
+    Returns:
+        A `(n_players // 2, 2)` array of player indices.
+    """
+    n_seats = n_players + n_players % 2
+    seats = np.empty(n_seats, dtype=np.int64)
+    seats[0] = 0
+    seats[1:] = np.roll(np.arange(1, n_seats), r % (n_seats - 1))
+    pairs = np.stack([seats[: n_seats // 2], seats[::-1][: n_seats // 2]], axis=1)
+    # with an odd number of players, the extra seat is a bye
+    return pairs[(pairs < n_players).all(axis=1)]
+
+
+# below this many matches per worker, shipping players to the pool costs more than it saves
+_MIN_PAIRS_PER_WORKER = 8
+
+
+def _player_state(agent):
+    """
+    Return the state that playing a match changes: the coins, the strategy state, the state of
+    the generator and the Q-values of learners with their last state and action.
+    """
+    state = {"coins": agent.coins, "state": agent.state}
+    rng = getattr(agent, "rng", None)
+    if rng is not None:
+        state["rng"] = rng.bit_generator.state
+    if isinstance(agent, QLearner):
+        table, slot = agent.table, agent.slot
+        state["q_values"] = table.values[slot].copy()
+        state["last_state"] = table.last_states[slot]
+        state["last_action"] = table.last_actions[slot]
+    return state
+
+
+def _restore_player_state(agent, state):
+    """
+    Write a state returned by `_player_state` back into the agent. Q-values are written into
+    the slot of the learner, so its table stays shared with the other learners.
+    """
+    agent.coins = state["coins"]
+    agent.state = state["state"]
+    if "rng" in state:
+        agent.rng.bit_generator.state = state["rng"]
+    if "q_values" in state:
+        table, slot = agent.table, agent.slot
+        table.values[slot] = state["q_values"]
+        table.last_states[slot] = state["last_state"]
+        table.last_actions[slot] = state["last_action"]
+
+
+def _play_shard(pairs, reward_matrix, n_round):
+    """
+    Play matches in a worker process and return the state of their players, in the order
+    `agent1, agent2` of each pair.
+    """
+    states = []
+    for agent1, agent2 in pairs:
+        play_match(agent1, agent2, reward_matrix, n_round, notify=False)
+        states.append(_player_state(agent1))
+        states.append(_player_state(agent2))
+    return states
+
+
+class Tournament:
+    def __init__(
+        self, reward_matrix, n_round, vectorize=False, n_workers=None, seed=None
+    ) -> None:
+        """
+        Play the matches of a round of the prisoner's dilemma.
+
+        Parameters:
+            `reward_matrix` (list):
+                The 2x2x2 reward matrix, see `PDGameEnv`.
+            `n_round` (int):
+                The number of iterations of every match.
+            `vectorize` (bool, optional):
+                Whether to play matches between players with `transitions` and `QLearner`s all
+                at once as NumPy arrays. Such matches don't publish actions. Other matches are
+                played one by one with `play_match`. Defaults to False.
+            `n_workers` (int, optional):
+                The number of worker processes that the matches played one by one are sharded
+                across. Players are copied to the workers and their coins, `state`, generator
+                and Q-values are copied back after every wave of matches, so actions played in
+                workers aren't published. Defaults to playing in the current process.
+            `seed` (int, optional):
+                Seed of the exploration of `QLearner`s played as arrays. They draw from a generator
+                of the tournament rather than their own `rng`.
+        """
+        self.reward_matrix = reward_matrix
+        self.n_round = n_round
+        self.vectorize = vectorize
+        self.n_workers = n_workers
+        self._pool = None
+        self.rng = np.random.default_rng(seed)
+        self._rewards = np.asarray(reward_matrix)
+        self._type_codes = {}
+        self._actions = self._next_states = None
+
+    def play(self, pairs, notify=True):
+        """
+        Play a list of `(agent1, agent2)` matches. An agent may play several matches, which
+        are then played in the order they are listed.
+        """
+        if not self.vectorize and (self.n_workers or 1) == 1:
+            for agent1, agent2 in pairs:
+                play_match(agent1, agent2, self.reward_matrix, self.n_round, notify)
+            return
+
+        for wave in self._waves(pairs):
+            vectorized, fallback = [], []
+            for agent1, agent2 in wave:
+                if (
+                    self.vectorize
+                    and self._is_vectorizable(agent1)
+                    and self._is_vectorizable(agent2)
+                ):
+                    vectorized.append((agent1, agent2))
+                else:
+                    fallback.append((agent1, agent2))
+            if vectorized:
+                self._play_vectorized(vectorized)
+            if fallback:
+                self._play_fallback(fallback, notify)
+
+    def close(self):
+        """
+        Shut down the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _play_fallback(self, pairs, notify):
+        n_shards = min(self.n_workers or 1, len(pairs) // _MIN_PAIRS_PER_WORKER)
+        if n_shards <= 1:
+            for agent1, agent2 in pairs:
+                play_match(agent1, agent2, self.reward_matrix, self.n_round, notify)
+            return
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.n_workers)
+        bounds = np.linspace(0, len(pairs), n_shards + 1).astype(int).tolist()
+        futures = [
+            (
+                pairs[start:stop],
+                self._pool.submit(
+                    _play_shard, pairs[start:stop], self.reward_matrix, self.n_round
+                ),
+            )
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        for shard, future in futures:
+            players = [agent for pair in shard for agent in pair]
+            for agent, state in zip(players, future.result()):
+                _restore_player_state(agent, state)
+
+    def _waves(self, pairs):
+        """
+        Split matches into waves in which every agent plays at most once, keeping the order of
+        the matches of each agent.
+        """
+        last_wave = {}
+        waves = []
+        for agent1, agent2 in pairs:
+            wave = max(last_wave.get(agent1.id, -1), last_wave.get(agent2.id, -1)) + 1
+            last_wave[agent1.id] = last_wave[agent2.id] = wave
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append((agent1, agent2))
+        return waves
+
+    def _type_code(self, player_type):
+        code = self._type_codes.get(player_type)
+        if code is None:
+            code = self._type_codes[player_type] = len(self._type_codes)
+            tables = list(self._type_codes)
+            n_states = max(len(cls.transitions) for cls in tables)
+            self._actions = np.zeros((len(tables), n_states, 2), dtype=np.int8)
+            self._next_states = np.zeros((len(tables), n_states, 2), dtype=np.int16)
+            for i, cls in enumerate(tables):
+                for state, row in enumerate(cls.transitions):
+                    for observed, (action, next_state) in enumerate(row):
+                        self._actions[i, state, observed] = action.value
+                        self._next_states[i, state, observed] = next_state
+        return code
+
+    @staticmethod
+    def _is_vectorizable(agent):
+        return agent.transitions is not None or isinstance(agent, QLearner)
+
+    def _play_vectorized(self, pairs):
+        players = [agent for agent, _ in pairs] + [agent for _, agent in pairs]
+        population = (
+            players[0].population if isinstance(players[0], PlayerView) else None
+        )
+        if population is not None:
+            # players stored in a population are read from and written to its arrays
+            slots = np.array([agent.slot for agent in players])
+            codes = np.array([self._type_code(cls) for cls in population.player_types])
+            fsm = np.arange(len(players))
+            learners = np.empty(0, dtype=np.int64)
+            types = codes[population.types[slots]]
+            states = population.states[slots]
+        else:
+            is_learner = np.array([isinstance(agent, QLearner) for agent in players])
+            fsm = np.flatnonzero(~is_learner)
+            learners = np.flatnonzero(is_learner)
+            types = np.array(
+                [self._type_code(type(players[i])) for i in fsm.tolist()],
+                dtype=np.int64,
+            )
+            states = np.array([players[i].state for i in fsm.tolist()], dtype=np.int64)
+            if len(learners):
+                batch = _LearnerBatch([players[i] for i in learners.tolist()])
+        coins = np.zeros(len(players), dtype=self._rewards.dtype)
+
+        m = len(pairs)
+        opponents = np.concatenate([np.arange(m, 2 * m), np.arange(m)])
+        actions = np.full(len(players), Action.Cooperate.value, dtype=np.int8)
+        rewards = np.zeros(len(players), dtype=self._rewards.dtype)
+        for _ in range(self.n_round):
+            # like `Player.make_decision`, the reward of an iteration is collected at the
+            # next decision, so the reward of the last iteration is never collected
+            coins += rewards
+            observed = actions[opponents]
+            if len(learners):
+                actions = np.empty_like(actions)
+                actions[learners] = batch.decide(
+                    observed[learners], rewards[learners], self.rng
+                )
+                observed = observed[fsm]
+            if len(fsm):
+                actions[fsm], states = (
+                    self._actions[types, states, observed],
+                    self._next_states[types, states, observed],
+                )
+            first, second = actions[:m], actions[m:]
+            rewards = np.concatenate(
+                [
+                    self._rewards[first, second, 0],
+                    self._rewards[first, second, 1],
+                ]
+            )
+
+        if population is not None:
+            population.states[slots] = states
+            population.coins[slots] += coins
+            return
+        if len(learners):
+            batch.save()
+        for i, state in zip(fsm.tolist(), states.tolist()):
+            players[i].state = state
+        for agent, gain in zip(players, coins.tolist()):
+            agent.coins += gain
+
+
+class _LearnerBatch:
+    """
+    The Q-values of a group of `QLearner`s gathered from their tables, updated together and
+    written back with `save`.
+    """
+
+    def __init__(self, learners) -> None:
+        self.learners = learners
+        self.alpha = np.array([learner.alpha for learner in learners])
+        self.gamma = np.array([learner.gamma for learner in learners])
+        self.epsilon = np.array([learner.epsilon for learner in learners])
+        self._groups = {}  # id of table -> (table, positions in the batch, slots)
+        for i, learner in enumerate(learners):
+            table = learner.table
+            self._groups.setdefault(id(table), (table, [], []))
+            self._groups[id(table)][1].append(i)
+            self._groups[id(table)][2].append(learner.slot)
+        n = len(learners)
+        self.values = np.empty((n,) + learners[0].table.values.shape[1:])
+        self.last_states = np.empty(n, dtype=np.int8)
+        self.last_actions = np.empty(n, dtype=np.int8)
+        for table, positions, slots in self._groups.values():
+            self.values[positions] = table.values[slots]
+            self.last_states[positions] = table.last_states[slots]
+            self.last_actions[positions] = table.last_actions[slots]
+        self._rows = np.arange(n)
+
+    def decide(self, observed, last_rewards, rng):
+        """
+        Choose the actions of the learners after observing the last actions of their opponents,
+        and update their Q-values with the rewards of their last actions, as
+        `QLearner.make_decision` does.
+        """
+        rows, values = self._rows, self.values
+        explore = rng.random(len(rows)) < self.epsilon
+        actions = np.where(
+            explore,
+            rng.integers(values.shape[2], size=len(rows)),
+            values[rows, observed].argmax(axis=1),
+        ).astype(np.int8)
+
+        has_last = self.last_states >= 0
+        current = values[rows, self.last_states, self.last_actions]
+        updated = (1 - self.alpha) * current + self.alpha * (
+            last_rewards + self.gamma * values[rows, observed].max(axis=1)
+        )
+        values[
+            rows[has_last], self.last_states[has_last], self.last_actions[has_last]
+        ] = updated[has_last]
+
+        self.last_states = observed.astype(np.int8)
+        self.last_actions = actions
+        return actions
+
+    def save(self):
+        for table, positions, slots in self._groups.values():
+            table.values[slots] = self.values[positions]
+            table.last_states[slots] = self.last_states[positions]
+            table.last_actions[slots] = self.last_actions[positions]
@@ -1,6 +1,7 @@
 import math
 import random
 from collections import defaultdict
+import numpy as np
 from pyglet import shapes, text
 from pyglet.graphics import Batch
 from ..window_base import WindowBase
@@ -13,8 +14,18 @@ class PDGameWindow(WindowBase):
         solve_interval=0.1,
         run_on_show=True,
         *args,
+        lod_threshold=200,
         **kwargs,
     ):
+        """
+        Parameters:
+            `lod_threshold` (int, optional):
+                Populations of more agents than this are drawn at a lower level of detail: agents
+                of a type are drawn as one arc with the total coins of the type, and only the pairs
+                that are playing are connected. Defaults to 200.
+        """
+        # decided once, as evolution keeps the number of agents
+        self.lod = len(env.agents) > lod_threshold
         super().__init__(
             env, solve_interval, run_on_show, *args, **kwargs, resizable=True
         )
@@ -23,25 +34,51 @@ class PDGameWindow(WindowBase):
         self._line_batch = Batch()
         self._agent_sprites = {}
         self._agent_colors = {}
+        self._agent_types = {}
         self._legend_labels = {}
         self._legend_icons = {}
-        self._lines = []
+        self._lines = {}  # (smaller agent id, larger agent id) -> line
+        self._active_pairs = set()  # pairs of `_lines` that are playing
         self._coin_labels = {}
+        self._coins = {}  # the coins shown by `_coin_labels`
+        self._positions = {}
+        self._layout = None  # the window size and agents the positions are laid out for
+        # level-of-detail drawing
+        self._type_arcs = {}
+        self._type_labels = {}
+        self._type_coins = {}  # the coins shown by `_type_labels`
+        self._type_codes = None  # index of the type of every agent in `_type_order`
+        self._type_order = []
+        # a pool of lines, the first `_n_pair_lines` of which are shown
+        self._pair_lines = []
+        self._n_pair_lines = 0
         self._init_batch()
 
-    def _add_agent(self, agent):
-        agent_type = agent.type
+    @staticmethod
+    def _pair(agent_id1, agent_id2):
+        return (
+            (agent_id1, agent_id2) if agent_id1 < agent_id2 else (agent_id2, agent_id1)
+        )
+
+    def _type_color(self, agent_type):
+        """
+        Return the colour of a type of agents, picking a random one for a new type.
+        """
         if agent_type not in self._agent_colors:
             self._agent_colors[agent_type] = (
                 random.randint(0, 255),
                 random.randint(0, 255),
                 random.randint(0, 255),
             )
+        return self._agent_colors[agent_type]
 
+    def _add_agent(self, agent):
+        agent_type = agent.type
+        self._agent_types[agent.id] = agent_type
         if agent_type not in self._legend_icons:
             self._add_legend(agent_type)
 
-        color = self._agent_colors[agent_type]
+        color = self._type_color(agent_type)
         self._agent_sprites[agent.id] = shapes.Circle(
             0, 0, 20, color=color, batch=self._batch
         )
@@ -54,9 +91,10 @@ class PDGameWindow(WindowBase):
             anchor_y="center",
             batch=self._batch,
         )
+        self._coins[agent.id] = agent.coins
 
         # Create connection lines
-        for other_agent_id, other_sprite in self._agent_sprites.items():
+        for other_agent_id in self._agent_sprites:
             if other_agent_id != agent.id:
                 line = shapes.Line(
                     0,
@@ -67,7 +105,7 @@ class PDGameWindow(WindowBase):
                     color=(211, 211, 211),
                     batch=self._line_batch,  # Use line_batch
                 )
-                self._lines.append((agent.id, other_agent_id, line))
+                self._lines[self._pair(agent.id, other_agent_id)] = line
 
     def _remove_agent(self, agent_id):
         if agent_id in self._agent_sprites:
@@ -77,25 +115,22 @@ class PDGameWindow(WindowBase):
         if agent_id in self._coin_labels:
             self._coin_labels[agent_id].delete()
             del self._coin_labels[agent_id]
+            del self._coins[agent_id]
 
-        agent_type = next(
-            (agent.type for agent in self.env.agents if agent.id == agent_id), None
-        )
-
-        if agent_type and all(
-            agent.type != agent_type
-            for agent in self.env.agents
-            if agent.id != agent_id
-        ):
+        agent_type = self._agent_types.pop(agent_id, None)
+        if agent_type and agent_type not in self._agent_types.values():
             self._remove_legend(agent_type)
 
         # Remove lines associated with the agent
-        self._lines = [
-            line for line in self._lines if line[0] != agent_id and line[1] != agent_id
-        ]
+        for other_agent_id in self._agent_sprites:
+            pair = self._pair(agent_id, other_agent_id)
+            line = self._lines.pop(pair, None)
+            if line is not None:
+                line.delete()
+            self._active_pairs.discard(pair)
 
     def _add_legend(self, agent_type):
-        color = self._agent_colors[agent_type]
+        color = self._type_color(agent_type)
         circle_icon = shapes.Circle(0, 0, 10, color=color, batch=self._batch)
         self._legend_icons[agent_type] = circle_icon
 
@@ -119,34 +154,69 @@ class PDGameWindow(WindowBase):
             del self._legend_labels[agent_type]
 
     def _init_batch(self):
+        if self.lod:
+            return
         for agent in self.env.agents:
             self._add_agent(agent)
 
     def _update_batch(self):
+        if self.lod:
+            self._update_lod_batch()
+            return
+        agents = self.env.agents
         # Synchronize agent sprites with env.agents
         current_agent_ids = set(self._agent_sprites.keys())
-        env_agent_ids = set(agent.id for agent in self.env.agents)
-
-        # Remove agents that no longer exist
-        for agent_id in current_agent_ids - env_agent_ids:
-            self._remove_agent(agent_id)
-
-        # Add new agents
-        for agent_id in env_agent_ids - current_agent_ids:
-            agent = next(agent for agent in self.env.agents if agent.id == agent_id)
-            self._add_agent(agent)
-
-        # Remove legends for agent types that no longer exist
-        current_agent_types = set(agent.type for agent in self.env.agents)
-        legend_agent_types = set(self._legend_labels.keys())
-
-        for agent_type in legend_agent_types - current_agent_types:
-            self._remove_legend(agent_type)
-
-        # Add legends for new agent types
-        for agent_type in current_agent_types - legend_agent_types:
-            self._add_legend(agent_type)
+        env_agent_ids = set(agent.id for agent in agents)
+        if env_agent_ids != current_agent_ids:
+            # Remove agents that no longer exist
+            for agent_id in current_agent_ids - env_agent_ids:
+                self._remove_agent(agent_id)
 
+            # Add new agents
+            for agent in agents:
+                if agent.id not in current_agent_ids:
+                    self._add_agent(agent)
+
+            # Remove legends for agent types that no longer exist
+            current_agent_types = set(self._agent_types.values())
+            legend_agent_types = set(self._legend_labels.keys())
+
+            for agent_type in legend_agent_types - current_agent_types:
+                self._remove_legend(agent_type)
+
+            # Add legends for new agent types
+            for agent_type in current_agent_types - legend_agent_types:
+                self._add_legend(agent_type)
+
+        # the layout only changes with the window size or the agents
+        layout = (self.get_size(), tuple(agent.id for agent in agents))
+        if layout != self._layout:
+            self._layout = layout
+            self._update_layout()
+
+        # Update the coins of agents whose coins changed
+        for agent in agents:
+            coins = agent.coins
+            if self._coins[agent.id] != coins:
+                self._coins[agent.id] = coins
+                self._coin_labels[agent.id].text = str(coins)
+
+        # Recolor the lines of pairs which started or stopped playing
+        active_pairs = {
+            self._pair(agent_id1, agent_id2)
+            for agent_id1, agent_id2 in self.env.on_round.items()
+        }
+        active_pairs.intersection_update(self._lines)
+        for pair in active_pairs - self._active_pairs:
+            self._lines[pair].color = (255, 255, 0)  # Light yellow
+        for pair in self._active_pairs - active_pairs:
+            self._lines[pair].color = (211, 211, 211)  # Light gray
+        self._active_pairs = active_pairs
+
+    def _layout_legend(self):
+        """
+        Stack the legend of every type in the top right corner of the window.
+        """
         window_width, window_height = self.get_size()
         x_offset = window_width - 150
         y_offset = window_height - 50
@@ -161,6 +231,10 @@ class PDGameWindow(WindowBase):
             label.x = x_offset + 20
             label.y = y_pos
 
+    def _update_layout(self):
+        self._layout_legend()
+
+        window_width, window_height = self.get_size()
         # Update agent positions in a circular layout
         center_x = window_width // 2
         center_y = window_height // 2
@@ -171,7 +245,8 @@ class PDGameWindow(WindowBase):
         for agent in self.env.agents:
             agent_groups[agent.type].append(agent)
 
-        positions = {}
+        positions = self._positions
+        positions.clear()
         total_agents = sum(len(agents) for agents in agent_groups.values())
         angle_step = 360 / total_agents
 
@@ -188,24 +263,130 @@ class PDGameWindow(WindowBase):
                 label = self._coin_labels[agent.id]
                 label.x = sprite.x + (center_x - sprite.x) * 0.15  # Move towards center
                 label.y = sprite.y + (center_y - sprite.y) * 0.15
-                label.text = str(agent.coins)
 
                 current_angle += angle_step
 
-        # Update line positions and colors
-        for agent_id1, agent_id2, line in self._lines:
+        # Update line positions
+        for (agent_id1, agent_id2), line in self._lines.items():
             x1, y1 = positions[agent_id1]
             x2, y2 = positions[agent_id2]
             line.x, line.y, line.x2, line.y2 = (x1, y1, x2, y2)
 
+    def _update_lod_batch(self):
+        agents = self.env.agents
+        layout = (self.get_size(), tuple(agent.id for agent in agents))
+        if layout != self._layout:
+            self._layout = layout
+            self._update_lod_layout()
+
+        # Update the total coins of every type
+        coins = np.bincount(
+            self._type_codes,
+            weights=self.env.observe(),
+            minlength=len(self._type_order),
+        )
+        for agent_type, type_coins in zip(self._type_order, coins.tolist()):
+            type_coins = round(type_coins)
+            if self._type_coins[agent_type] != type_coins:
+                self._type_coins[agent_type] = type_coins
+                self._type_labels[agent_type].text = str(type_coins)
+
+        # Connect the pairs which are playing, reusing the lines of the pool
+        on_round = self.env.on_round
+        positions = self._positions
+        n_lines = 0
+        for agent_id1, agent_id2 in on_round.items():
             if (
-                agent_id1 in self.env.on_round
-                and self.env.on_round[agent_id1] == agent_id2
+                agent_id1 > agent_id2
+                or on_round.get(agent_id2) != agent_id1
+                or agent_id1 not in positions
+                or agent_id2 not in positions
             ):
-                line.color = (255, 255, 0)  # Light yellow
-            else:
-                line.color = (211, 211, 211)  # Light gray
+                continue
+            if n_lines == len(self._pair_lines):
+                self._pair_lines.append(
+                    shapes.Line(0, 0, 0, 0, color=(255, 255, 0), batch=self._line_batch)
+                )
+            line = self._pair_lines[n_lines]
+            x1, y1 = positions[agent_id1]
+            x2, y2 = positions[agent_id2]
+            line.x, line.y, line.x2, line.y2 = (x1, y1, x2, y2)
+            line.visible = True
+            n_lines += 1
+        for line in self._pair_lines[n_lines : self._n_pair_lines]:
+            line.visible = False
+        self._n_pair_lines = n_lines
+
+    def _update_lod_layout(self):
+        agents = self.env.agents
+        # Group agents by type
+        agent_groups = defaultdict(list)
+        for agent in agents:
+            agent_groups[agent.type].append(agent.id)
+        self._type_order = list(agent_groups)
+        codes = {agent_type: i for i, agent_type in enumerate(self._type_order)}
+        self._type_codes = np.array(
+            [codes[agent.type] for agent in agents], dtype=np.intp
+        )
 
+        # Synchronize legends with the types
+        for agent_type in set(self._legend_labels) - set(agent_groups):
+            self._remove_legend(agent_type)
+        for agent_type in self._type_order:
+            if agent_type not in self._legend_labels:
+                self._add_legend(agent_type)
+        self._layout_legend()
+
+        window_width, window_height = self.get_size()
+        center_x = window_width // 2
+        center_y = window_height // 2
+        radius = min(window_width, window_height) // 2 - 50
+        angle_step = 360 / len(agents)
+
+        # Agents are evenly spaced on the circle, and every type is an arc over its agents
+        for arc in self._type_arcs.values():
+            arc.delete()
+        self._type_arcs = {}
+        positions = self._positions
+        positions.clear()
+        first = 0
+        for agent_type, agent_ids in agent_groups.items():
+            angles = np.radians((first + np.arange(len(agent_ids))) * angle_step)
+            xs = (center_x + radius * np.cos(angles)).tolist()
+            ys = (center_y + radius * np.sin(angles)).tolist()
+            positions.update(zip(agent_ids, zip(xs, ys)))
+
+            self._type_arcs[agent_type] = shapes.Arc(
+                center_x,
+                center_y,
+                radius,
+                angle=len(agent_ids) * angle_step,
+                start_angle=first * angle_step,
+                thickness=12,
+                color=self._type_color(agent_type),
+                batch=self._batch,
+            )
+
+            # the total coins of the type are shown inside the middle of its arc
+            middle = math.radians((first + len(agent_ids) / 2) * angle_step)
+            if agent_type not in self._type_labels:
+                self._type_labels[agent_type] = text.Label(
+                    "",
+                    font_size=12,
+                    color=(0, 0, 0, 255),
+                    anchor_x="center",
+                    anchor_y="center",
+                    batch=self._batch,
+                )
+                self._type_coins[agent_type] = None
+            label = self._type_labels[agent_type]
+            label.x = center_x + 0.85 * radius * math.cos(middle)
+            label.y = center_y + 0.85 * radius * math.sin(middle)
+            first += len(agent_ids)
+
+        for agent_type in set(self._type_labels) - set(agent_groups):
+            self._type_labels.pop(agent_type).delete()
+            del self._type_coins[agent_type]
 
     def _draw_batch(self):
         self._line_batch.draw()
@@ -0,0 +1,73 @@
+import sys
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+
+
+def _attach(name):
+    """
+    Attach to an existing segment without registering it with the resource tracker of this
+    process, which would unlink it when this process exits. Only its creator should unlink it.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # unregistering after attaching would also drop the registration of the creator when both
+    # processes share a tracker, as forked workers do, so the registration is skipped instead
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedArray:
+    def __init__(self, shape, dtype, name=None) -> None:
+        """
+        A NumPy array backed by `multiprocessing.shared_memory`, so other processes can read and
+        write it without copying.
+
+        Parameters:
+            `shape` (tuple):
+                The shape of the array.
+            `dtype` (np.dtype):
+                The dtype of the array.
+            `name` (str, optional):
+                The name of an existing segment to attach to. Defaults to creating a new segment,
+                which the creator should `unlink` when it is no longer needed.
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self._shm = (
+            shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+            if name is None
+            else _attach(name)
+        )
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    @property
+    def spec(self):
+        """
+        A picklable `(name, shape, dtype)` tuple to attach to the array with `attach`.
+        """
+        return self._shm.name, self.shape, self.dtype.str
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype = spec
+        return cls(shape, dtype, name)
+
+    def close(self):
+        """
+        Detach from the segment. The array must not be used afterwards.
+        """
+        # views must be released before the buffer they point to
+        self.array = None
+        self._shm.close()
+
+    def unlink(self):
+        """
+        Detach from the segment and destroy it.
+        """
+        self.close()
+        self._shm.unlink()
@@ -12,5 +12,30 @@ class SimEnv(ABC):
     @abstractmethod
     def update(self, id, ret):
         """
-            Update environment base on `ret` which is returned by a specific agent whose id is `id`.
+        Update environment base on `ret` which is returned by a specific agent whose id is `id`.
         """
+
+    @abstractmethod
+    def step(self):
+        """
+        Advance the environment by one step. Return whether the environment is still running.
+        """
+
+    @abstractmethod
+    def reset(self):
+        """
+        Reset the environment to its initial state.
+        """
+
+    def observe(self):
+        """
+        Return an observation of the current state as a NumPy array, whose shape and dtype don't
+        change between steps and episodes.
+        """
+        raise NotImplementedError("This method should be implemented by derived class")
+
+    def reward(self):
+        """
+        Return the reward collected during the last step.
+        """
+        raise NotImplementedError("This method should be implemented by derived class")
@@ -0,0 +1,204 @@
+import multiprocessing as mp
+import numpy as np
+from multiprocessing import resource_tracker
+from .shm import SharedArray
+
+
+def _worker(index, env_fn, conn):
+    """
+    Run an environment in a subprocess. It writes observations, rewards and dones into the
+    shared buffers of the `VecEnv` and only sends small messages through `conn`.
+    """
+    env = env_fn()
+    obs = env.observe()
+    conn.send((obs.shape, obs.dtype.str))
+    buffers = [SharedArray.attach(spec) for spec in conn.recv()]
+    observations, rewards, dones = (buffer.array for buffer in buffers)
+    try:
+        while True:
+            command = conn.recv()
+            if command == "step":
+                done = not env.step()
+                rewards[index] = env.reward()
+                dones[index] = done
+                if done:
+                    env.reset()
+                np.copyto(observations[index], env.observe())
+            elif command == "reset":
+                env.reset()
+                np.copyto(observations[index], env.observe())
+            elif command == "close":
+                break
+            conn.send(None)
+    finally:
+        # views must be released before the buffers they point to
+        del observations, rewards, dones
+        for buffer in buffers:
+            buffer.close()
+        conn.close()
+
+
+class VecEnv:
+    def __init__(self, env_fns, mode="inprocess", context=None) -> None:
+        """
+        Run several copies of an environment and batch their observations, rewards and dones.
+
+        Environments are stepped by their own solvers or players, so `step` takes no actions. An
+        environment whose `step` returns False is done, and it is reset right away. Its
+        observation is then the first one of the next episode.
+
+        Parameters:
+            `env_fns` (list):
+                Picklable callables, e.g. `functools.partial(MazeCleanEnv, 10, 10, 4,
+                headless=True)`, each returning a `SimEnv` that implements `observe` and `reward`.
+            `mode` (str, optional):
+                "inprocess" steps the environments one after another in the current process.
+                Environments of one process share pubsub topics, so they must not publish actions,
+                e.g. `MazeCleanEnv(headless=True)` or `PDGameEnv(engine="vectorized")` with
+                table-driven players only. "subprocess" runs every environment in a worker process
+                which writes into shared-memory buffers. Defaults to "inprocess".
+            `context` (str, optional):
+                The multiprocessing start method of the workers. Defaults to the platform default.
+
+        Raises:
+            ValueError: If the mode is unknown, the environments have different observation shapes
+                or, in "inprocess" mode, an environment isn't headless.
+        """
+        if mode not in ["inprocess", "subprocess"]:
+            raise ValueError(f"Unknown mode {mode}")
+        self.mode = mode
+        self.num_envs = len(env_fns)
+        self._buffers = []
+        self._conns = []
+        self._processes = []
+
+        if mode == "inprocess":
+            self.envs = [env_fn() for env_fn in env_fns]
+            if not all(getattr(env, "headless", True) for env in self.envs):
+                raise ValueError(
+                    'Environments stepped in "inprocess" mode must be headless, '
+                    'use headless=True or the "subprocess" mode'
+                )
+            specs = [
+                (env.observe().shape, env.observe().dtype.str) for env in self.envs
+            ]
+            self._check_specs(specs)
+            shape, dtype = specs[0]
+            self._obs = np.empty((self.num_envs,) + shape, dtype=dtype)
+            self._rewards = np.zeros(self.num_envs)
+            self._dones = np.zeros(self.num_envs, dtype=bool)
+            return
+
+        ctx = mp.get_context(context)
+        # workers inherit the resource tracker of this process only if it is already running,
+        # otherwise each of them would start its own, which unlinks the shared memory on exit
+        resource_tracker.ensure_running()
+        for index, env_fn in enumerate(env_fns):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker, args=(index, env_fn, child), daemon=True
+            )
+            process.start()
+            child.close()
+            self._conns.append(parent)
+            self._processes.append(process)
+        try:
+            specs = [conn.recv() for conn in self._conns]
+            self._check_specs(specs)
+            shape, dtype = specs[0]
+            self._buffers = [
+                SharedArray((self.num_envs,) + tuple(shape), dtype),
+                SharedArray((self.num_envs,), np.float64),
+                SharedArray((self.num_envs,), bool),
+            ]
+            self._obs, self._rewards, self._dones = (
+                buffer.array for buffer in self._buffers
+            )
+            for conn in self._conns:
+                conn.send([buffer.spec for buffer in self._buffers])
+        except BaseException:
+            self.close()
+            raise
+
+    def reset(self):
+        """
+        Reset every environment.
+
+        Returns:
+            The batched observations. In "subprocess" mode the array is backed by shared memory
+            and overwritten by the next call, copy it to keep it.
+        """
+        if self.mode == "inprocess":
+            for i, env in enumerate(self.envs):
+                env.reset()
+                np.copyto(self._obs[i], env.observe())
+        else:
+            self._broadcast("reset")
+        self._rewards[:] = 0
+        self._dones[:] = False
+        return self._obs
+
+    def step(self):
+        """
+        Step every environment.
+
+        Returns:
+            A tuple `(observations, rewards, dones)` of arrays whose first dimension is the
+            environment. In "subprocess" mode they are backed by shared memory and overwritten by
+            the next call, copy them to keep them.
+        """
+        if self.mode == "inprocess":
+            for i, env in enumerate(self.envs):
+                done = not env.step()
+                self._rewards[i] = env.reward()
+                self._dones[i] = done
+                if done:
+                    env.reset()
+                np.copyto(self._obs[i], env.observe())
+        else:
+            self._broadcast("step")
+        return self._obs, self._rewards, self._dones
+
+    def close(self):
+        """
+        Stop the workers and release the shared memory.
+        """
+        for conn in self._conns:
+            try:
+                conn.send("close")
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join()
+        for conn in self._conns:
+            conn.close()
+        self._conns, self._processes = [], []
+
+        if self._buffers:
+            # drop the views before releasing the buffers they point to
+            self._obs = self._rewards = self._dones = None
+            for buffer in self._buffers:
+                buffer.unlink()
+            self._buffers = []
+
+    def _broadcast(self, command):
+        for conn in self._conns:
+            conn.send(command)
+        for conn in self._conns:
+            conn.recv()
+
+    @staticmethod
+    def _check_specs(specs):
+        if any(spec != specs[0] for spec in specs):
+            raise ValueError(
+                "All environments should have observations of the same shape and dtype"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.num_envs
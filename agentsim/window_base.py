@@ -1,11 +1,40 @@
+import threading
+import time
 import pyglet
 from pyglet.window import key
 
+# the simulation thread of `steps_per_frame=None` holds the lock of the environment for this
+# many seconds at most, then releases it for a pause of `_SIMULATE_PAUSE` seconds
+_SIMULATE_SLICE = 0.01
+_SIMULATE_PAUSE = 0.001
+
 
 class WindowBase(pyglet.window.Window):
-    def __init__(self, env, solve_interval=0.1, run_on_show=True, *args, **kwargs):
+    def __init__(
+        self,
+        env,
+        solve_interval=0.1,
+        run_on_show=True,
+        *args,
+        steps_per_frame=1,
+        **kwargs,
+    ):
+        """
+        Parameters:
+            `env` (SimEnv):
+                The environment to simulate and draw.
+            `solve_interval` (float, optional):
+                The time in seconds between two frames. Defaults to 0.1.
+            `run_on_show` (bool, optional):
+                Whether the simulation starts unpaused. Defaults to True.
+            `steps_per_frame` (int, optional):
+                The number of environment steps per frame. If None, the environment is stepped as
+                fast as possible in a background thread and every frame draws its latest state.
+                Defaults to 1.
+        """
         super().__init__(*args, **kwargs)
         self.env = env
+        self.steps_per_frame = steps_per_frame
 
         pyglet.gl.glClearColor(0.96, 0.96, 0.96, 1)
         self._batch = pyglet.graphics.Batch()
@@ -13,14 +42,73 @@ class WindowBase(pyglet.window.Window):
         self.push_handlers(self.key_handler)
         self.pause = not run_on_show
 
+        # the simulation thread holds the lock while it steps, frames hold it while they draw
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._finished = False
+        self._error = None  # an exception raised by the simulation thread
+        self._thread = None
+
         def update(dt):
-            if not self.pause and any(agent.is_alive for agent in self.env.agents):
-                if self.env.step():
-                    self._update_batch()
-                else:
-                    pyglet.clock.unschedule(update)
+            if self.pause or not any(agent.is_alive for agent in self.env.agents):
+                return
+            is_working = True
+            for _ in range(self.steps_per_frame):
+                is_working = self.env.step()
+                if not is_working:
+                    break
+            self._update_batch()
+            if not is_working:
+                pyglet.clock.unschedule(update)
+
+        def draw_latest(dt):
+            if self._error is not None:
+                pyglet.clock.unschedule(draw_latest)
+                raise self._error
+            # read before drawing, so that the last state is drawn before unscheduling
+            finished = self._finished
+            if self._thread is None and not self._stop.is_set():
+                # started from the first frame, once derived classes have initialized
+                self._thread = threading.Thread(target=self._simulate, daemon=True)
+                self._thread.start()
+            with self._lock:
+                self._update_batch()
+            if finished:
+                pyglet.clock.unschedule(draw_latest)
 
-        pyglet.clock.schedule_interval(update, solve_interval)
+        if steps_per_frame is None:
+            pyglet.clock.schedule_interval(draw_latest, solve_interval)
+        else:
+            pyglet.clock.schedule_interval(update, solve_interval)
+
+    def _simulate(self):
+        """
+        Step the environment until it finishes or the window closes. It runs in a background thread.
+        An exception stops the simulation and is raised by the next frame.
+        """
+        try:
+            while not self._stop.is_set():
+                if self.pause or not any(agent.is_alive for agent in self.env.agents):
+                    self._stop.wait(0.01)
+                    continue
+                # step for a time slice, then pause shortly so that frames can take the lock
+                with self._lock:
+                    deadline = time.perf_counter() + _SIMULATE_SLICE
+                    is_working = True
+                    while is_working and time.perf_counter() < deadline:
+                        is_working = self.env.step()
+                if not is_working:
+                    self._finished = True
+                    return
+                self._stop.wait(_SIMULATE_PAUSE)
+        except Exception as e:
+            self._error = e
+            self._stop.set()
+
+    def _stop_simulation(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
 
     def _init_batch(self):
         """
@@ -45,10 +133,15 @@ class WindowBase(pyglet.window.Window):
         self._draw_batch()
 
     def on_close(self):
+        self._stop_simulation()
         for agent in self.env.agents:
             agent.terminate()
         super().on_close()
 
+    def close(self):
+        self._stop_simulation()
+        super().close()
+
     def on_key_press(self, symbol, modifiers):
         if symbol == key.SPACE:
             self.pause = not self.pause
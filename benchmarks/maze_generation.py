@@ -0,0 +1,48 @@
+"""
+Report the throughput of the maze generators in cells per second.
+
+`reproducible` tells whether two generators built with the same seed produce the
+same maze, bit for bit.
+
+    python benchmarks/maze_generation.py --sizes 100 500 2000
+"""
+
+import argparse
+import time
+from agentsim.maze import GrowingTree, Kruskal, RecursiveDivision
+
+SYMBOL_MAP = {"wall": -2, "visited": -1, "cell": 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generators = {
+        "GrowingTree": lambda seed: GrowingTree(SYMBOL_MAP, seed=seed),
+        "GrowingTree (prim)": lambda seed: GrowingTree(
+            SYMBOL_MAP, backtrack_ratio=0.0, seed=seed
+        ),
+        "Kruskal": lambda seed: Kruskal(SYMBOL_MAP, seed=seed),
+        "RecursiveDivision": lambda seed: RecursiveDivision(SYMBOL_MAP, seed=seed),
+    }
+
+    print(
+        f"{'maze':>11} {'generator':>18} {'time (s)':>9} {'cells/s':>12} {'reproducible':>12}"
+    )
+    for size in args.sizes:
+        for name, make in generators.items():
+            start = time.perf_counter()
+            grid = make(args.seed)(size, size)
+            elapsed = time.perf_counter() - start
+            reproducible = (make(args.seed)(size, size) == grid).all()
+            print(
+                f"{f'{size}x{size}':>11} {name:>18} {elapsed:>9.3f} "
+                f"{size * size / elapsed:>12,.0f} {str(reproducible):>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare build time and balance of the maze partition strategies.
+
+Balance is the size of the largest part divided by the ideal size `n_cells / n_parts`,
+so 1.0 is a perfect split. `connected` is the fraction of parts that are connected.
+
+    python benchmarks/partition.py --sizes 20 50 100 --parts 4 8
+"""
+
+import argparse
+import time
+import networkx as nx
+import numpy as np
+from agentsim.maze import GrowingTree, SpectralPartitioner, TreePartitioner
+from agentsim.maze.graph import MazeGraph
+
+SYMBOL_MAP = {"wall": -2, "visited": -1, "cell": 0}
+DENSE_LIMIT = 5000  # dense spectral clustering is quadratic in memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--parts", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    strategies = {
+        "spectral (dense)": SpectralPartitioner(sparse=False, random_state=args.seed),
+        "spectral (sparse)": SpectralPartitioner(sparse=True, random_state=args.seed),
+        "tree": TreePartitioner(),
+    }
+
+    print(
+        f"{'maze':>9} {'cells':>8} {'parts':>5} {'strategy':>18} "
+        f"{'time (s)':>9} {'balance':>8} {'connected':>9}"
+    )
+    for size in args.sizes:
+        grid = GrowingTree(SYMBOL_MAP, seed=args.seed)(size, size)
+        graph = MazeGraph.from_grid(
+            grid, [SYMBOL_MAP["cell"]], {SYMBOL_MAP["cell"]: "cell"}
+        )
+        nx_graph = nx.Graph()
+        nx_graph.add_nodes_from(graph)
+        nx_graph.add_edges_from((u, v) for u in graph for v in graph.neighbors(u))
+        nodes = list(graph)
+
+        for n_parts in args.parts:
+            for name, partitioner in strategies.items():
+                if name == "spectral (dense)" and len(graph) > DENSE_LIMIT:
+                    continue
+                start = time.perf_counter()
+                labels = partitioner(graph, n_parts)
+                elapsed = time.perf_counter() - start
+
+                sizes = np.bincount(labels, minlength=n_parts)
+                connected = np.mean(
+                    [
+                        nx.is_connected(
+                            nx_graph.subgraph(
+                                node for node, label in zip(nodes, labels) if label == i
+                            )
+                        )
+                        for i in range(n_parts)
+                        if sizes[i] > 0
+                    ]
+                )
+                print(
+                    f"{f'{size}x{size}':>9} {len(graph):>8} {n_parts:>5} {name:>18} "
+                    f"{elapsed:>9.3f} {sizes.max() * n_parts / len(graph):>8.2f} "
+                    f"{connected:>9.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
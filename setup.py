@@ -4,7 +4,7 @@ setup(
     name="agentsim",
     version="0.1",
     packages=find_packages(),
-    install_requires=["numpy", "pyglet", "pubsub", "scikit-learn", "networkx"],
+    install_requires=["numpy", "pyglet", "pubsub", "scikit-learn", "networkx", "scipy"],
     author="Kamichanw",
     author_email="865710157@qq.com",
     description="A Python library for simulating multi-agent environments",